@@ -1,48 +1,129 @@
 import os
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import pandas as pd
 
 from models.train_country_regression import (
-    ensure_country_models, predict_country_medals, predict_top25
+    ensure_country_models, predict_country_medals, predict_top25, predict_countries,
+    forecast_seasons, COUNTRY_FILES
 )
 from models.train_athlete_classifier import (
-    ensure_athlete_model, predict_athletes_batch
+    ensure_athlete_model, predict_athletes_examples, predict_athletes_many, MODEL_PATH as ATHLETE_MODEL_PATH
 )
+from models.athlete_fastpath import ExamplesError
 from models.train_clustering import (
-    ensure_clustering_model, cluster_countries
+    ensure_clustering_model, cluster_countries, clear_cluster_cache, sweep_clusters, CLUST_PATH
 )
+from features.feature_store import get_feature_store
+from models.registry import get_registry
+import serving
+import responses
+from responses import etag_cached
+from serving import offload, offload_training, MicroBatcher
 
 app = Flask(__name__)
 CORS(app)  # autorise http://localhost:5173 par défaut
+serving.install(app)  # 503 / 504 en mode asynchrone (SERVE_ASYNC=1 ou --async)
+responses.install(app)  # JSON via orjson si installé + gzip selon Accept-Encoding
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 ARTIFACTS_DIR = os.path.join(os.path.dirname(__file__), "artifacts")
 os.makedirs(ARTIFACTS_DIR, exist_ok=True)
 
-# Entraîne/charge modèles au boot
-ensure_country_models(DATA_DIR, ARTIFACTS_DIR)
-ensure_athlete_model(DATA_DIR, ARTIFACTS_DIR)
-ensure_clustering_model(DATA_DIR, ARTIFACTS_DIR)
+# Features pays construites une seule fois par process (cf. features/feature_store.py)
+feature_store = get_feature_store(DATA_DIR)
+feature_store.warm()
+
+# Clustering ajustés gardés aussi sur disque (artifacts/clusters) si CLUST_PERSIST=1
+CLUST_PERSIST = os.environ.get("CLUST_PERSIST", "0") == "1"
+
+# Entraîne/charge modèles au boot (TRAIN_ON_BOOT=0 : artefacts existants seulement, cf. server.py)
+if os.environ.get("TRAIN_ON_BOOT", "1") == "1":
+    ensure_country_models(DATA_DIR, ARTIFACTS_DIR)
+    ensure_athlete_model(DATA_DIR, ARTIFACTS_DIR)
+    ensure_clustering_model(DATA_DIR, ARTIFACTS_DIR)
+
+# Artefacts chargés une seule fois en mémoire (cf. models/registry.py)
+registry = get_registry(ARTIFACTS_DIR)
+registry.get("country", COUNTRY_FILES)
+registry.get("athletes", [ATHLETE_MODEL_PATH])
+registry.get("clustering", [CLUST_PATH])
+
+def _version(*bundles):
+    """Empreinte données + modèles d'une route GET (ETag, cf. responses.etag_cached)."""
+    def version():
+        return feature_store.fingerprint(), tuple(registry.get(name, files).version for name, files in bundles)
+    return version
+
+country_version = _version(("country", COUNTRY_FILES))
+clustering_version = _version(("clustering", [CLUST_PATH]))
 
 @app.get("/health")
 def health():
-    return jsonify(status="ok")
+    return jsonify(status="ok", models=registry.versions())
 
 # ---- PREDICTIONS PAYS ----
 @app.get("/predict/france")
+@etag_cached(country_version)
 def api_predict_france():
     year = int(request.args.get("year", 2024))
-    out = predict_country_medals(DATA_DIR, ARTIFACTS_DIR, target_noc="FRA", year=year)
+    out = offload(predict_country_medals, DATA_DIR, ARTIFACTS_DIR, target_noc="FRA", year=year)
     return jsonify(out)
 
 @app.get("/predict/top25")
+@etag_cached(country_version)
 def api_predict_top25():
     year = int(request.args.get("year", 2024))
-    res = predict_top25(DATA_DIR, ARTIFACTS_DIR, year=year, top_k=25)
+    res = offload(predict_top25, DATA_DIR, ARTIFACTS_DIR, year=year, top_k=25)
+    return jsonify(res)
+
+@app.get("/predict/top")
+@etag_cached(country_version)
+def api_predict_top():
+    year = int(request.args.get("year", 2024))
+    season = request.args.get("season", "Summer").title()
+    k = int(request.args.get("k", 25))
+    if k < 1:
+        return jsonify(error="k must be >= 1"), 400
+    seasons = forecast_seasons(DATA_DIR, ARTIFACTS_DIR)
+    if season not in seasons:
+        return jsonify(error=f"season must be one of {', '.join(seasons)}"), 400
+    res = offload(predict_top25, DATA_DIR, ARTIFACTS_DIR, year=year, season=season, top_k=k)
+    return jsonify(res)
+
+def _list_arg(name: str):
+    """Paramètre multi-valeurs : ?noc=FRA,USA ou ?noc=FRA&noc=USA."""
+    values = []
+    for v in request.args.getlist(name):
+        values.extend(x.strip() for x in v.split(",") if x.strip())
+    return values
+
+@app.get("/predict/countries")
+@etag_cached(country_version)
+def api_predict_countries():
+    """
+    /predict/countries?noc=FRA,USA&year=2024,2028&season=Summer,Winter
+    Sans `noc` (ou noc=all) : tous les pays.
+    """
+    nocs = _list_arg("noc")
+    if not nocs or [n.lower() for n in nocs] == ["all"]:
+        nocs = None
+    years = [int(y) for y in _list_arg("year")] or [2024]
+    seasons = [s.title() for s in _list_arg("season")] or ["Summer"]
+    res = offload(predict_countries, DATA_DIR, ARTIFACTS_DIR, nocs=nocs, years=years, seasons=seasons)
     return jsonify(res)
 
 # ---- PREDICTIONS ATHLETES ----
+# Regroupement des requêtes concurrentes en un seul predict_proba (ATHLETE_BATCH=1)
+athlete_batcher = None
+if os.environ.get("ATHLETE_BATCH", "0") == "1":
+    athlete_batcher = MicroBatcher(
+        lambda items: predict_athletes_many(ARTIFACTS_DIR, [ex for ex, _ in items], [c for _, c in items]),
+        max_items=int(os.environ.get("ATHLETE_BATCH_MAX", 256)),
+        max_wait_ms=float(os.environ.get("ATHLETE_BATCH_WAIT_MS", 5)),
+        size=lambda item: len(item[0]),
+        name="athletes-batcher",
+    )
+
 @app.post("/predict/athletes")
 def api_predict_athletes():
     """
@@ -57,35 +138,87 @@ def api_predict_athletes():
         ...
       ]
     }
+    ?format=columns : réponse en colonnes ({"columns": {"age": [...], "proba_medal": [...], ...}})
+    au lieu d'une liste d'objets, conseillé pour les gros lots.
+    Exemples invalides : 400 avec la liste des erreurs ({"row", "field", "error"}).
     """
     payload = request.get_json(force=True)
-    df = pd.DataFrame(payload.get("examples", []))
-    preds = predict_athletes_batch(ARTIFACTS_DIR, df)
+    if not isinstance(payload, dict) or not isinstance(payload.get("examples", []), list):
+        raise ExamplesError([{"row": None, "field": "", "error": "expected {\"examples\": [...]}"}])
+    examples = payload.get("examples", [])
+    columnar = request.args.get("format", "records") == "columns"
+    if athlete_batcher is not None:
+        preds = athlete_batcher.submit((examples, columnar))
+    else:
+        preds = offload(predict_athletes_examples, ARTIFACTS_DIR, examples, columnar=columnar)
     return jsonify(preds)
 
+@app.errorhandler(ExamplesError)
+def api_examples_error(e):
+    return jsonify(error="invalid examples", details=e.errors, truncated=e.truncated), 400
+
 # ---- CLUSTERING ----
 @app.get("/cluster/countries")
+@etag_cached(clustering_version)
 def api_cluster_countries():
     year = int(request.args.get("year", 2020))
     k = int(request.args.get("k", 5))
-    labels, centers = cluster_countries(DATA_DIR, ARTIFACTS_DIR, year=year, k=k)
-    return jsonify({"year": year, "k": k, "labels": labels, "centroids": centers})
+    labels, centers = offload(cluster_countries, DATA_DIR, ARTIFACTS_DIR, year=year, k=k, persist=CLUST_PERSIST)
+    return jsonify({"year": year, "k": k, "model_version": registry.versions().get("clustering"),
+                    "labels": labels, "centroids": centers})
+
+@app.get("/cluster/countries/sweep")
+@etag_cached(clustering_version)
+def api_cluster_sweep():
+    """/cluster/countries/sweep?year=2016,2020&k_min=2&k_max=10&season=Summer"""
+    years = [int(y) for y in _list_arg("year")] or [2020]
+    k_min = int(request.args.get("k_min", 2))
+    k_max = int(request.args.get("k_max", 10))
+    season = request.args.get("season", "Summer").title()
+    res = offload(sweep_clusters, DATA_DIR, ARTIFACTS_DIR, years=years, ks=list(range(k_min, k_max + 1)),
+                  season=season)
+    return jsonify(res)
 
 # ---- TRAIN ENDPOINTS (optionnel) ----
+def _retrain_country(n_jobs):
+    feature_store.invalidate()
+    return ensure_country_models(DATA_DIR, ARTIFACTS_DIR, force_retrain=True, n_jobs=n_jobs)
+
+def _retrain_athletes():
+    feature_store.invalidate()
+    ensure_athlete_model(DATA_DIR, ARTIFACTS_DIR, force_retrain=True)
+
+def _retrain_clustering():
+    feature_store.invalidate()
+    clear_cluster_cache()
+    ensure_clustering_model(DATA_DIR, ARTIFACTS_DIR, force_retrain=True)
+
 @app.post("/train/country")
 def api_train_country():
-    ensure_country_models(DATA_DIR, ARTIFACTS_DIR, force_retrain=True)
-    return jsonify({"status": "retrained"})
+    n_jobs = request.args.get("n_jobs", type=int)
+    if n_jobs is not None and n_jobs < 1:
+        return jsonify(error="n_jobs must be >= 1"), 400
+    timings = offload_training(_retrain_country, n_jobs)
+    return jsonify({"status": "retrained", "model_version": registry.versions().get("country"),
+                    "fit_seconds": timings})
 
 @app.post("/train/athletes")
 def api_train_athletes():
-    ensure_athlete_model(DATA_DIR, ARTIFACTS_DIR, force_retrain=True)
-    return jsonify({"status": "retrained"})
+    offload_training(_retrain_athletes)
+    return jsonify({"status": "retrained", "model_version": registry.versions().get("athletes")})
 
 @app.post("/train/clustering")
 def api_train_clustering():
-    ensure_clustering_model(DATA_DIR, ARTIFACTS_DIR, force_retrain=True)
-    return jsonify({"status": "retrained"})
+    offload_training(_retrain_clustering)
+    return jsonify({"status": "retrained", "model_version": registry.versions().get("clustering")})
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="API IA (Flask)")
+    parser.add_argument("--async", dest="async_mode", action="store_true",
+                        help="calculs dans un pool borné avec délai par requête (cf. serving.py)")
+    args = parser.parse_args()
+    if args.async_mode:
+        serving.configure(async_mode=True)
+    app.run(host="0.0.0.0", port=5001, debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,244 @@
+# bench.py
+"""
+Benchmarks des chemins chauds (features, entraînement, inférence).
+
+    python bench.py --scales 1,4,16 --repeat 3 --out bench_results.json
+    python bench.py --baseline bench_baseline.json            # compare, code retour 1 si régression
+    python bench.py --only read_medals,predict_top25 --scales 1
+
+Pour chaque facteur d'échelle, un jeu de données est préparé une fois dans
+`--work-dir` (jeu synthétique, cf. generate_dataset.py, cache Arrow seul)
+avec ses propres artefacts. Chaque benchmark mesure la durée (meilleure et médiane de
+`--repeat` exécutions) puis le pic mémoire (tracemalloc, sur une exécution
+à part : le suivi ralentit le code mesuré). tracemalloc voit les objets
+Python et les tableaux NumPy, pas les buffers Arrow ni les arbres sklearn
+alloués en C : le pic sert à comparer deux versions, pas à dimensionner.
+
+Les résultats (JSON) se comparent à une base de référence produite sur la
+même machine : `--save-baseline` l'écrit, `--baseline` la relit.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from olympics_common.dataset_cache import workbook_exists
+from features.build_country_features import build_country_features
+from features.build_athlete_features import build_athlete_features
+from models.utils import read_medals, read_hosts, build_country_panel
+from models.train_country_regression import ensure_country_models, predict_top25, _fit_models
+from models.train_athlete_classifier import ensure_athlete_model, predict_athletes_batch
+from models.train_clustering import ensure_clustering_model, cluster_countries, clear_cluster_cache
+from generate_dataset import generate, MEDALS_FILE, HOSTS_FILE
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.join(HERE, "..", "dataset")
+
+# en dessous, un écart de durée est du bruit de mesure
+MIN_SECONDS_DELTA = 0.005
+
+
+def prepare(work_dir: str, source_dir: str, factor: int):
+    """Données + artefacts entraînés pour un facteur d'échelle (non mesuré)."""
+    data_dir = os.path.join(work_dir, f"x{factor}", "data")
+    artifacts_dir = os.path.join(work_dir, f"x{factor}", "artifacts")
+    medals, hosts = os.path.join(data_dir, MEDALS_FILE), os.path.join(data_dir, HOSTS_FILE)
+    if not (workbook_exists(medals) and os.path.exists(hosts)):
+        generate(source_dir, data_dir, factor, xlsx=False)
+    os.makedirs(artifacts_dir, exist_ok=True)
+    ensure_country_models(data_dir, artifacts_dir)
+    ensure_athlete_model(data_dir, artifacts_dir)
+    ensure_clustering_model(data_dir, artifacts_dir)
+    return data_dir, artifacts_dir
+
+
+# ----------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------
+def _country_xy(data_dir):
+    df = build_country_features(data_dir)
+    targets = ["Gold", "Silver", "Bronze"]
+    X = df[[c for c in df.columns if c not in targets + ["Country", "NOC", "Year", "Season"]]]
+    return X, df["Gold"].values, df["Silver"].values, df["Bronze"].values
+
+
+def _athlete_examples(data_dir, n):
+    df = build_athlete_features(data_dir).drop(columns=["label_medal"])
+    return df.sample(n=n, replace=len(df) < n, random_state=0).reset_index(drop=True)
+
+
+def _latest_summer_year(data_dir):
+    panel = build_country_panel(read_medals(data_dir), read_hosts(data_dir))
+    return int(panel.loc[panel["Season"] == "Summer", "Year"].max())
+
+
+def benchmarks(data_dir: str, artifacts_dir: str, factor: int):
+    """
+    (nom, préparation non mesurée -> arguments, fonction mesurée, remise à zéro avant chaque exécution).
+    """
+    def clustering_setup():
+        return (data_dir, artifacts_dir), {"year": _latest_summer_year(data_dir), "k": 5}
+
+    return [
+        ("read_medals", lambda: ((data_dir,), {}), read_medals, None),
+        ("read_hosts", lambda: ((data_dir,), {}), read_hosts, None),
+        ("build_country_features", lambda: ((data_dir,), {}), build_country_features, None),
+        ("build_country_panel", lambda: ((read_medals(data_dir), read_hosts(data_dir)), {}),
+         build_country_panel, None),
+        ("build_athlete_features", lambda: ((data_dir,), {}), build_athlete_features, None),
+        ("_fit_models", lambda: (_country_xy(data_dir), {}), _fit_models, None),
+        ("predict_top25", lambda: ((data_dir, artifacts_dir), {"year": 2024}), predict_top25, None),
+        ("cluster_countries", clustering_setup, cluster_countries, clear_cluster_cache),
+        ("predict_athletes_batch", lambda: ((artifacts_dir, _athlete_examples(data_dir, 1000 * factor)), {}),
+         predict_athletes_batch, None),
+    ]
+
+
+def measure(fn, args, kwargs, repeat: int, reset=None) -> dict:
+    times = []
+    for _ in range(max(1, repeat)):
+        if reset:
+            reset()
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(*args, **kwargs)
+        times.append(time.perf_counter() - t0)
+
+    if reset:
+        reset()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds_best": round(min(times), 6),
+        "seconds_median": round(statistics.median(times), 6),
+        "peak_mb": round(peak / 2 ** 20, 3),
+        "runs": len(times),
+    }
+
+
+# ----------------------------------------------------
+# Résultats / comparaison
+# ----------------------------------------------------
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> dict:
+    import sklearn
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """
+    Régressions (durée ou pic mémoire au-delà de baseline x (1 + tolerance))
+    pour chaque (benchmark, échelle) présent des deux côtés.
+    """
+    base = {(r["name"], r["scale"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get((r["name"], r["scale"]))
+        if b is None:
+            continue
+        slower = (r["seconds_best"] > b["seconds_best"] * (1 + tolerance)
+                  and r["seconds_best"] - b["seconds_best"] > MIN_SECONDS_DELTA)
+        bigger = r["peak_mb"] > b["peak_mb"] * (1 + tolerance) and r["peak_mb"] - b["peak_mb"] > 1
+        if slower or bigger:
+            regressions.append({
+                "name": r["name"], "scale": r["scale"],
+                "seconds": [b["seconds_best"], r["seconds_best"]],
+                "peak_mb": [b["peak_mb"], r["peak_mb"]],
+            })
+    return regressions
+
+
+def _print_row(r, b=None):
+    ratio = f"  x{r['seconds_best'] / b['seconds_best']:.2f}" if b and b["seconds_best"] else ""
+    print(f"{r['name']:<24} x{r['scale']:<5} {r['seconds_best'] * 1000:>10.1f} ms "
+          f"(med {r['seconds_median'] * 1000:.1f})  {r['peak_mb']:>9.1f} Mo{ratio}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks features / entraînement / inférence")
+    parser.add_argument("--source", default=DEFAULT_SOURCE,
+                        help=f"dossier contenant {MEDALS_FILE} et {HOSTS_FILE}")
+    parser.add_argument("--work-dir", default=os.path.join(HERE, ".bench"),
+                        help="jeux de données et artefacts par échelle (réutilisés d'un lancement à l'autre)")
+    parser.add_argument("--scales", default="1,2,4", help="facteurs d'échelle, ex: 1,4,16")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default=None, help="benchmarks à lancer, séparés par des virgules")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="résultats de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="écart toléré (0.25 = +25%%)")
+    parser.add_argument("--save-baseline", default=None, help="écrit aussi les résultats comme référence")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    only = set(args.only.split(",")) if args.only else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    base_index = {(r["name"], r["scale"]): r for r in baseline or []}
+
+    results = []
+    for factor in scales:
+        print(f"== échelle x{factor}")
+        data_dir, artifacts_dir = prepare(args.work_dir, args.source, factor)
+        for name, setup, fn, reset in benchmarks(data_dir, artifacts_dir, factor):
+            if only and name not in only:
+                continue
+            fn_args, fn_kwargs = setup()
+            fn(*fn_args, **fn_kwargs)  # échauffement (imports, caches disque)
+            r = {"name": name, "scale": factor, **measure(fn, fn_args, fn_kwargs, args.repeat, reset)}
+            results.append(r)
+            _print_row(r, base_index.get((name, factor)))
+
+    report = {"environment": environment(), "repeat": args.repeat, "results": results}
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(f"Résultats : {args.out}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for reg in regressions:
+            print(f"RÉGRESSION {reg['name']} x{reg['scale']} : {reg['seconds'][0]:.4f}s -> {reg['seconds'][1]:.4f}s, "
+                  f"{reg['peak_mb'][0]:.1f} -> {reg['peak_mb'][1]:.1f} Mo")
+        if regressions:
+            sys.exit(1)
+        print(f"Aucune régression (tolérance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
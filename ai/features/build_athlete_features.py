@@ -4,6 +4,10 @@ import pandas as pd
 import numpy as np
 import hashlib
 
+from olympics_common.dataset_cache import read_excel_cached
+from models.utils import flag_hosts
+from features.feature_store import get_feature_store
+
 def _hash_to_int(x: str, mod: int = 10_000) -> int:
     if x is None:
         return 0
@@ -15,7 +19,7 @@ def build_athlete_features(data_dir: str) -> pd.DataFrame:
     Source: olympic_medals.xlsx (ne contient que des médaillés => on fabrique des négatifs réalistes).
     """
     path = os.path.join(data_dir, "olympic_medals.xlsx")
-    df = pd.read_excel(path)
+    df = read_excel_cached(path)
     df.columns = df.columns.str.lower()
 
     # Champs attendus dans ton xlsx d’origine
@@ -33,12 +37,10 @@ def build_athlete_features(data_dir: str) -> pd.DataFrame:
     df["event_id"] = df["event"].map(lambda s: _hash_to_int(s, 5000))
     df["country_id"] = df["country_code3"].map(lambda s: _hash_to_int(s, 1000))
 
-    # Heuristique is_host depuis le slug
-    slug = df["slug_game"].astype(str).str.lower()
-    df["is_host"] = np.where(
-        slug.str.contains("paris-2024") | slug.str.contains("paris2024"),
-        1, 0
-    )
+    # is_host : (slug du jeu, NOC) présent dans l'index des pays hôtes (partagé, cf. FeatureStore.host_index)
+    host_index = get_feature_store(data_dir).host_index().rename(
+        columns={"game_slug": "slug_game", "NOC": "country_3_letter_code"})
+    df["is_host"] = flag_hosts(df, host_index, ["slug_game", "country_3_letter_code"]).astype(int)
 
     # POSITIFS (médaillés)
     pos = df.copy()
@@ -1,7 +1,6 @@
 import os
 import pandas as pd
-import numpy as np
-from models.utils import read_medals, read_hosts
+from models.utils import read_medals, flag_hosts
 
 def build_country_features(data_dir: str) -> pd.DataFrame:
     """
@@ -9,16 +8,15 @@ def build_country_features(data_dir: str) -> pd.DataFrame:
     avec des features exploitables pour la régression.
     """
 
+    from features.feature_store import get_feature_store  # import local : feature_store importe ce module
+
     #Chargement des données
     medals = read_medals(data_dir)
-    hosts = read_hosts(data_dir)
-
-    # jointure avec les hôtes
-    hosts = hosts.rename(columns={"game_year": "Year", "game_season": "Season"})
-    df = medals.merge(hosts, on=["Year", "Season"], how="left")
 
-    # Feature "is_host"
-    df["is_host"] = np.where(df["Country"].str.lower().isin(df["game_location"].astype(str).str.lower()), 1, 0)
+    # Feature "is_host" : jointure avec l'index des pays hôtes (partagé, cf. FeatureStore.host_index)
+    df = medals.copy()
+    host_index = get_feature_store(data_dir).host_index()
+    df["is_host"] = flag_hosts(df, host_index, ["Year", "Season", "NOC"]).astype(int)
 
     # Lags : valeurs des années précédentes
     df = df.sort_values(["NOC", "Season", "Year"]).reset_index(drop=True)
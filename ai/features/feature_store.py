@@ -0,0 +1,118 @@
+# features/feature_store.py
+import os
+import threading
+import pandas as pd
+
+from models.utils import read_medals, read_hosts, build_country_panel, build_host_index
+from features.build_country_features import build_country_features
+from olympics_common.dataset_cache import CACHE_SUFFIX, file_sha256
+
+INPUT_FILES = ("olympic_medals.xlsx", "olympic_hosts.xml")
+
+
+def _view(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copie "lecture seule" pour l'appelant : les modifications qu'il fait
+    (ex: last["Year"] = year) ne remontent jamais dans le cache.
+    Avec Copy-on-Write la copie superficielle suffit et ne coûte rien.
+    """
+    if pd.get_option("mode.copy_on_write"):
+        return df.copy(deep=False)
+    return df.copy()
+
+
+class FeatureStore:
+    """
+    Construit une seule fois par process les tables dérivées des fichiers
+    de `data_dir` (features pays, panel pays) et les sert depuis la mémoire.
+    Le cache est invalidé explicitement (endpoints /train/*) ou dès que
+    le contenu d'un fichier d'entrée change.
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self._lock = threading.RLock()
+        self._tables = {}
+        self._fingerprint = None
+        self._hashes = {}
+
+    def _content(self, path: str):
+        """(taille, SHA-256) d'un fichier ; le hash n'est recalculé que si le stat change."""
+        st = os.stat(path)
+        key = (st.st_size, st.st_mtime_ns, st.st_ino)
+        cached = self._hashes.get(path)
+        if cached is None or cached[0] != key:
+            cached = self._hashes[path] = (key, file_sha256(path))
+        return st.st_size, cached[1]
+
+    def fingerprint(self):
+        """
+        Empreinte des fichiers d'entrée (taille + SHA-256 du contenu) : une
+        copie de ai/data lors d'un déploiement change les mtime, pas l'empreinte.
+        """
+        fp = []
+        for name in INPUT_FILES:
+            path = os.path.join(self.data_dir, name)
+            # jeu généré sans classeur : le cache Arrow fait foi (cf. dataset_cache)
+            for candidate in (path, path + CACHE_SUFFIX):
+                try:
+                    fp.append((name, *self._content(candidate)))
+                    break
+                except OSError:
+                    continue
+            else:
+                fp.append((name, None, None))
+        return tuple(fp)
+
+    def invalidate(self):
+        with self._lock:
+            self._tables.clear()
+            self._fingerprint = None
+
+    def _get(self, key: str, build):
+        fp = self.fingerprint()
+        with self._lock:
+            if fp != self._fingerprint:
+                self._tables.clear()
+                self._fingerprint = fp
+            if key not in self._tables:
+                self._tables[key] = build()
+            return self._tables[key]
+
+    def host_index(self) -> pd.DataFrame:
+        """
+        Index des pays hôtes (build_host_index), construit une fois par
+        version des données et partagé par les builders pays, panel et athlètes.
+        """
+        def _build():
+            codes = read_medals(self.data_dir)[["Country", "NOC"]].drop_duplicates()
+            return build_host_index(read_hosts(self.data_dir), codes)
+        return _view(self._get("host_index", _build))
+
+    def country_features(self) -> pd.DataFrame:
+        """Équivalent de build_country_features(data_dir), mis en cache."""
+        return _view(self._get("country_features", lambda: build_country_features(self.data_dir)))
+
+    def country_panel(self) -> pd.DataFrame:
+        """Équivalent de build_country_panel(read_medals, read_hosts), mis en cache."""
+        def _build():
+            return build_country_panel(read_medals(self.data_dir), None, host_index=self.host_index())
+        return _view(self._get("country_panel", _build))
+
+    def warm(self):
+        """Pré-construit toutes les tables (appelé au démarrage de l'API)."""
+        self.country_features()
+        self.country_panel()
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_feature_store(data_dir: str) -> FeatureStore:
+    key = os.path.abspath(data_dir)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = _STORES[key] = FeatureStore(data_dir)
+        return store
@@ -0,0 +1,291 @@
+# generate_dataset.py
+"""
+Jeux de données synthétiques à grande échelle (tests de charge hors ligne).
+
+    python generate_dataset.py --scales 10,100,1000
+    python generate_dataset.py --scales 10 --out-dir /tmp/jo --no-xlsx
+
+Pour un facteur F, chaque édition réelle des Jeux est rejouée F fois
+(la réplique 0 est le jeu réel, inchangé) : mêmes disciplines, épreuves,
+types de médaille, types de participants et taux de valeurs manquantes
+que l'édition d'origine, donc les mêmes distributions par édition. Ce qui
+change dans une réplique :
+  - les pays : chaque réplique a son propre "jumeau" de chaque pays réel
+    (même profil de médailles, nouveau code, le même sur toutes les éditions).
+    Les années restent celles d'origine : avec des codes propres à chaque
+    réplique, le total d'un (année, pays) reste celui du pays d'origine ;
+    c'est le nombre de pays qui croît avec F, pas leurs totaux (vérifié à
+    l'écriture, cf. check_country_totals) ;
+  - l'hôte : le jumeau du pays hôte réel dans la réplique (l'avantage hôte est conservé) ;
+  - les athlètes : nouveaux noms tirés des prénoms / noms réels, un même
+    athlète garde son nom sur toutes ses médailles de l'édition ;
+  - le slug : ville + suffixe + année d'origine (tokyo-b-2020), que read_medals
+    découpe comme l'original (même année, même saison).
+
+Sorties dans `<out-dir>/x<F>/` : olympic_hosts.xml, le cache Arrow
+olympic_medals.xlsx.arrow (+ .arrow.json, cf. common/olympics_common/dataset_cache.py) et
+olympic_medals.xlsx quand il tient dans une feuille Excel (1 048 576 lignes,
+soit jusqu'à environ 48x). Au-delà, seul le cache est écrit, marqué
+`cache_only` : read_excel_cached, read_medals, build_athlete_features et
+ingest.py le lisent comme le classeur.
+"""
+import os
+import math
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from olympics_common.dataset_cache import read_excel_cached, write_cache_meta, cache_paths, pa, feather
+from models.utils import build_host_index
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.join(HERE, "..", "dataset")
+DEFAULT_OUT = os.path.join(HERE, "..", "dataset", "synthetic")
+MEDALS_FILE = "olympic_medals.xlsx"
+HOSTS_FILE = "olympic_hosts.xml"
+
+# lignes de données d'une feuille Excel (la première est l'en-tête)
+SHEET_MAX_ROWS = 1_048_576 - 1
+
+CODE_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _free_codes(used: set):
+    """Codes pays inutilisés : 3 lettres d'abord, puis 4, 5... (x1000 dépasse les 17 576 codes à 3 lettres)."""
+    for length in itertools.count(3):
+        for letters in itertools.product(CODE_LETTERS, repeat=length):
+            code = "".join(letters)
+            if code not in used:
+                yield code
+
+
+def _suffix(r: int) -> str:
+    """Suffixe d'une réplique : 1 -> 'b', 25 -> 'z', 26 -> 'ba'... (sans chiffres : l'année reste seule)."""
+    s = ""
+    while True:
+        r, d = divmod(r, 26)
+        s = chr(ord("a") + d) + s
+        if r == 0:
+            return s
+
+
+class Templates:
+    """Jeu réel préparé une fois pour produire les répliques (index vectorisés)."""
+
+    def __init__(self, medals: pd.DataFrame, hosts: pd.DataFrame, replicas: int):
+        self.medals = medals.reset_index(drop=True)
+        self.hosts = hosts.reset_index(drop=True)
+        self.replicas = replicas
+        m = self.medals
+
+        # éditions : slug -> ville, année
+        self.game_idx, games = pd.factorize(m["slug_game"])
+        self.games = list(games)
+        self.game_city = [s.rsplit("-", 1)[0] for s in self.games]
+        self.game_year = [s.rsplit("-", 1)[1] if "-" in s else "" for s in self.games]
+
+        # pays réels et leurs jumeaux : une ligne par réplique (r = 0 : le pays lui-même),
+        # aucun code partagé entre deux répliques
+        countries = (m[["country_3_letter_code", "country_name", "country_code"]]
+                     .drop_duplicates("country_3_letter_code").reset_index(drop=True))
+        self.codes = countries["country_3_letter_code"].tolist()
+        self.country_of_code = {code: i for i, code in enumerate(self.codes)}
+        self.country_idx = m["country_3_letter_code"].map(self.country_of_code).to_numpy()
+        n = len(self.codes)
+        free = _free_codes(set(self.codes))
+        self.twin_code3 = np.empty((replicas, n), dtype=object)
+        self.twin_name = np.empty((replicas, n), dtype=object)
+        self.twin_code2 = np.empty((replicas, n), dtype=object)
+        self.twin_code3[0] = countries["country_3_letter_code"].to_numpy(dtype=object)
+        self.twin_name[0] = countries["country_name"].to_numpy(dtype=object)
+        self.twin_code2[0] = countries["country_code"].astype(object).where(countries["country_code"].notna(), None)
+        for r in range(1, replicas):
+            self.twin_code3[r] = list(itertools.islice(free, n))
+            self.twin_name[r] = [f"{name} {r + 1}" for name in self.twin_name[0]]
+            self.twin_code2[r] = None  # codes ISO à 2 lettres : pas assez de combinaisons, laissés vides
+
+        # pays hôtes (indices) par édition, via l'index des hôtes (alias, co-organisation)
+        host_index = build_host_index(
+            hosts, countries.rename(columns={"country_name": "Country", "country_3_letter_code": "NOC"}))
+        self.host_countries = {}
+        for slug, noc in zip(host_index.get("game_slug", []), host_index["NOC"]):
+            if noc in self.country_of_code:
+                self.host_countries.setdefault(slug, []).append(self.country_of_code[noc])
+
+        # athlètes : identité = (édition, nom) ; prénoms / noms tirés des noms réels
+        names = m["athlete_full_name"]
+        self.has_name = names.notna().to_numpy()
+        key = m["slug_game"].astype(str) + "\x00" + names.astype(str)
+        self.athlete_idx, _ = pd.factorize(key)
+        self.n_athletes = int(self.athlete_idx.max()) + 1 if len(m) else 0
+        parts = names.dropna().drop_duplicates().str.rsplit(" ", n=1)
+        parts = parts[parts.str.len() == 2]
+        self.first_names = np.asarray(parts.str[0].drop_duplicates().tolist(), dtype=object)
+        self.last_names = np.asarray(parts.str[1].drop_duplicates().tolist(), dtype=object)
+
+        self.team_title = m["participant_title"]
+        self.has_url = m["athlete_url"].notna().to_numpy()
+
+    def replica(self, r: int, rng, start_index: int):
+        """(médailles, hôtes) de la réplique r (r >= 1)."""
+        m = self.medals
+        suffix = _suffix(r)
+        slugs = np.array([f"{city}-{suffix}-{year}" for city, year in zip(self.game_city, self.game_year)],
+                         dtype=object)
+
+        out = m.copy()
+        out["Unnamed: 0"] = np.arange(start_index, start_index + len(m))
+        out["slug_game"] = slugs[self.game_idx]
+        old_names = m["country_name"].to_numpy(dtype=object)
+        new_names = self.twin_name[r, self.country_idx]
+        out["country_3_letter_code"] = self.twin_code3[r, self.country_idx]
+        out["country_name"] = new_names
+        out["country_code"] = self.twin_code2[r, self.country_idx]
+
+        # titres d'équipe "<pays>..." : renommés avec le pays jumeau
+        titles = self.team_title.to_numpy(dtype=object)
+        out["participant_title"] = [
+            t if not isinstance(t, str) or not t.startswith(old) else new + t[len(old):]
+            for t, old, new in zip(titles, old_names, new_names)
+        ]
+
+        first = self.first_names[rng.integers(0, len(self.first_names), self.n_athletes)]
+        last = self.last_names[rng.integers(0, len(self.last_names), self.n_athletes)]
+        full = pd.Series(first, dtype=object) + " " + pd.Series(last, dtype=object)
+        names = full.to_numpy(dtype=object)[self.athlete_idx]
+        out["athlete_full_name"] = np.where(self.has_name, names, None)
+        slug_names = pd.Series(names, dtype=object).str.lower().str.replace(r"[^a-z0-9]+", "-", regex=True)
+        urls = ("https://olympics.com/en/athletes/" + slug_names).to_numpy(dtype=object)
+        out["athlete_url"] = np.where(self.has_url & self.has_name, urls, None)
+
+        hosts = self.hosts.copy()
+        locations, slugs_h = [], []
+        for slug, location in zip(hosts["game_slug"], hosts["game_location"]):
+            city, _, year = slug.rpartition("-")
+            slugs_h.append(f"{city}-{suffix}-{year}")
+            idx = self.host_countries.get(slug)
+            if not idx:
+                locations.append(location)  # hôte sans médailles connues : inchangé
+            else:
+                locations.append(", ".join(self.twin_name[r, c] for c in idx))
+        hosts["game_slug"] = slugs_h
+        hosts["game_location"] = locations
+        if "game_name" in hosts.columns:
+            hosts["game_name"] = hosts["game_name"].astype(str) + f" {suffix.upper()}"
+        return out, hosts
+
+
+def year_country_totals(df: pd.DataFrame) -> pd.Series:
+    """Nombre de lignes de médailles par (année du slug, code pays)."""
+    year = df["slug_game"].astype(str).str.rsplit("-", n=1).str[-1]
+    return df.groupby([year, df["country_3_letter_code"]]).size()
+
+
+def check_country_totals(source: pd.Series, parts: list, scale: int):
+    """
+    Vérifie que les totaux par (année, pays) du jeu généré suivent la
+    distribution du jeu réel : chaque total d'origine apparaît exactement
+    `scale` fois, aucun pays ne cumule les médailles de plusieurs répliques.
+    """
+    totals = pd.concat(parts).groupby(level=[0, 1]).sum()
+    expected = np.sort(np.tile(source.to_numpy(), scale))
+    if not np.array_equal(np.sort(totals.to_numpy()), expected):
+        (year, code), worst = totals.idxmax(), int(totals.max())
+        raise RuntimeError(f"totaux par (année, pays) faussés : {code} {year} = {worst} médailles "
+                           f"(max du jeu réel : {int(source.max())})")
+
+
+def _write_xlsx_rows(ws, df: pd.DataFrame):
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if (v is None or (isinstance(v, float) and math.isnan(v))) else v for v in row])
+
+
+def generate(source_dir: str, target_dir: str, scale: int, seed: int = 0, xlsx: bool = True):
+    """
+    Écrit le jeu x`scale` dans `target_dir` (cf. docstring du module).
+    Retourne le nombre de lignes de médailles.
+    """
+    if feather is None:
+        raise RuntimeError("pyarrow est nécessaire pour écrire le cache Arrow")
+    scale = max(1, int(scale))
+    rng = np.random.default_rng(seed)
+    medals = read_excel_cached(os.path.join(source_dir, MEDALS_FILE))
+    hosts = pd.read_xml(os.path.join(source_dir, HOSTS_FILE))
+    templates = Templates(medals, hosts, replicas=scale)
+
+    os.makedirs(target_dir, exist_ok=True)
+    medals_path = os.path.join(target_dir, MEDALS_FILE)
+    cache_path, meta_path = cache_paths(medals_path)
+    n_rows = len(medals) * scale
+    write_xlsx = xlsx and n_rows <= SHEET_MAX_ROWS
+    for stale in (medals_path, meta_path):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    schema = pa.Table.from_pandas(medals, preserve_index=False).schema.remove_metadata()
+    ws = wb = None
+    if write_xlsx:
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        # colonne d'index sans en-tête, relue "Unnamed: 0" comme l'original
+        ws.append(["" if c == "Unnamed: 0" else c for c in medals.columns])
+
+    all_hosts = [hosts]
+    totals = []
+    tmp_cache = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp_cache, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            start = len(medals)
+            for r in range(scale):
+                if r == 0:
+                    part = medals
+                else:
+                    part, part_hosts = templates.replica(r, rng, start)
+                    all_hosts.append(part_hosts)
+                    start += len(part)
+                totals.append(year_country_totals(part))
+                writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+                if ws is not None:
+                    _write_xlsx_rows(ws, part)
+                if r and r % 50 == 0:
+                    print(f"  x{scale}: {r}/{scale} répliques")
+        check_country_totals(totals[0], totals, scale)
+        if wb is not None:
+            tmp_xlsx = medals_path + ".tmp.xlsx"
+            wb.save(tmp_xlsx)
+            os.replace(tmp_xlsx, medals_path)
+        os.replace(tmp_cache, cache_path)
+    finally:
+        if os.path.exists(tmp_cache):
+            os.remove(tmp_cache)
+
+    write_cache_meta(medals_path, rows=n_rows, scale=scale, seed=seed)
+
+    hosts_out = pd.concat(all_hosts, ignore_index=True)
+    if "index" in hosts_out.columns:
+        hosts_out["index"] = np.arange(len(hosts_out))
+    hosts_out.to_xml(os.path.join(target_dir, HOSTS_FILE), index=False, root_name="data", row_name="row")
+    return n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des jeux médailles / hôtes synthétiques à l'échelle")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help=f"dossier contenant {MEDALS_FILE} et {HOSTS_FILE}")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT, help="un sous-dossier x<F> par facteur")
+    parser.add_argument("--scales", default="10,100,1000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-xlsx", dest="xlsx", action="store_false",
+                        help="cache Arrow seulement (l'écriture Excel est de loin la plus lente)")
+    args = parser.parse_args()
+
+    for scale in [int(s) for s in args.scales.split(",") if s.strip()]:
+        target = os.path.join(args.out_dir, f"x{scale}")
+        n = generate(args.source, target, scale, seed=args.seed, xlsx=args.xlsx)
+        print(f"x{scale}: {n} lignes -> {target}")
+
+
+if __name__ == "__main__":
+    main()
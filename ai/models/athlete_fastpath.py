@@ -0,0 +1,239 @@
+# models/athlete_fastpath.py
+"""
+Chemin rapide JSON -> NumPy pour /predict/athletes.
+
+Le pipeline athlètes (SimpleImputer + StandardScaler pour les colonnes
+numériques, SimpleImputer + OneHotEncoder pour les catégorielles) est
+"compilé" une fois par version d'artefact : médianes, moyennes / écarts-types,
+valeurs les plus fréquentes et index des catégories sont extraits du pipeline
+ajusté. Une requête est ensuite décodée colonne par colonne en tableaux typés,
+validée (erreurs par ligne et par champ), puis transformée en matrice creuse
+passée directement au classifieur : ni DataFrame ni colonnes object.
+
+Les probabilités sont celles de model.predict_proba(DataFrame), et les
+valeurs acceptées les mêmes : les colonnes numériques prennent aussi booléens
+(0 / 1) et nombres en texte ("25"), que le SimpleImputer convertit en float.
+"""
+import math
+import numpy as np
+import scipy.sparse as sp
+
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+MAX_ERRORS = 20
+
+# types convertis tels quels par np.array(dtype=float64), bool -> 0 / 1 comme dans le pipeline
+_NUMBER_TYPES = {int, float, bool, type(None)}
+
+
+class UnsupportedPipeline(Exception):
+    """Pipeline sans la forme attendue par AthleteFastPath : l'appelant revient au DataFrame."""
+
+
+class ExamplesError(ValueError):
+    """Exemples invalides : `errors` liste les problèmes ({"row", "field", "error"})."""
+
+    def __init__(self, errors, truncated: bool = False):
+        self.errors = errors
+        self.truncated = truncated
+        super().__init__("; ".join(f"{_where(e)}: {e['error']}" for e in errors[:3]))
+
+
+def _where(e) -> str:
+    if e["row"] is None:
+        return "examples"
+    return f"examples[{e['row']}].{e['field']}" if e["field"] else f"examples[{e['row']}]"
+
+
+class _Errors:
+    def __init__(self):
+        self.items = []
+        self.truncated = False
+
+    def add(self, row, field, error):
+        if len(self.items) >= MAX_ERRORS:
+            self.truncated = True
+            return
+        self.items.append({"row": row, "field": field, "error": error})
+
+    def raise_if_any(self):
+        if self.items:
+            raise ExamplesError(self.items, self.truncated)
+
+
+def _steps(transformer):
+    return list(transformer.named_steps.values()) if isinstance(transformer, Pipeline) else [transformer]
+
+
+class AthleteFastPath:
+    """
+    Transformation pré-calculée d'un pipeline athlètes ajusté. Lève
+    UnsupportedPipeline si le pipeline n'a pas la forme attendue : l'appelant
+    revient alors au DataFrame.
+    """
+
+    def __init__(self, pipeline):
+        if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+            raise UnsupportedPipeline("pipeline (pre, clf) attendu")
+        pre, self.clf = pipeline.steps[0][1], pipeline.steps[1][1]
+        if not isinstance(pre, ColumnTransformer):
+            raise UnsupportedPipeline("ColumnTransformer attendu")
+
+        self.num_cols, self.cat_cols = [], []
+        num_fill, num_mean, num_scale = [], [], []
+        cat_fill, self.cat_index, self.cat_is_str = [], [], []
+        order = []
+        for name, trans, cols in pre.transformers_:
+            if trans == "drop" or len(cols) == 0:
+                continue
+            steps = _steps(trans)
+            kinds = [type(s) for s in steps]
+            if kinds == [SimpleImputer, StandardScaler]:
+                imp, scaler = steps
+                n = len(cols)
+                num_fill.append(imp.statistics_)
+                num_mean.append(scaler.mean_ if scaler.mean_ is not None else np.zeros(n))
+                num_scale.append(scaler.scale_ if scaler.scale_ is not None else np.ones(n))
+                self.num_cols.extend(cols)
+                order.append("num")
+            elif kinds == [SimpleImputer, OneHotEncoder]:
+                imp, ohe = steps
+                infrequent = getattr(ohe, "infrequent_categories_", None) or []
+                if (ohe.drop_idx_ is not None or ohe.handle_unknown != "ignore"
+                        or any(c is not None for c in infrequent)):
+                    raise UnsupportedPipeline("OneHotEncoder(handle_unknown='ignore') sans drop attendu")
+                for col, fill, cats in zip(cols, imp.statistics_, ohe.categories_):
+                    index = {c: i for i, c in enumerate(cats.tolist())}
+                    self.cat_index.append(index)
+                    self.cat_is_str.append(all(isinstance(c, str) for c in index))
+                    cat_fill.append(index.get(fill, -1))
+                self.cat_cols.extend(cols)
+                order.append("cat")
+            else:
+                raise UnsupportedPipeline(f"transformeur non pris en charge : {name}")
+        if order != ["num", "cat"]:
+            raise UnsupportedPipeline("blocs (num, cat) attendus dans cet ordre")
+
+        self.num_fill = np.concatenate(num_fill)
+        self.num_mean = np.concatenate(num_mean)
+        self.num_scale = np.concatenate(num_scale)
+        self.cat_fill = np.asarray(cat_fill, dtype=np.int64)
+        # position de la première colonne one-hot de chaque variable catégorielle
+        sizes = [len(ix) for ix in self.cat_index]
+        self.cat_offset = len(self.num_cols) + np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.n_features = len(self.num_cols) + sum(sizes)
+        self.fields = self.num_cols + self.cat_cols
+
+    # ---- décodage ----
+    def _numeric(self, rows, col, errors):
+        values = [r.get(col) for r in rows]
+        if set(map(type, values)) <= _NUMBER_TYPES:
+            out = np.array(values, dtype=np.float64)  # None -> NaN
+            bad = np.isinf(out)
+            if not bad.any():
+                return out
+        out = np.empty(len(values), dtype=np.float64)
+        for i, v in enumerate(values):
+            if v is None:
+                out[i] = np.nan
+                continue
+            x = v
+            if type(v) is str:
+                # nombre en texte : converti comme par le pipeline ("nan" -> imputé)
+                try:
+                    x = float(v)
+                except ValueError:
+                    pass
+            if type(x) in _NUMBER_TYPES and not (isinstance(x, float) and math.isinf(x)):
+                out[i] = x
+            else:
+                errors.add(i, col, f"expected a finite number, got {v!r}")
+        return out
+
+    def _categorical(self, rows, j, errors):
+        col, index, is_str = self.cat_cols[j], self.cat_index[j], self.cat_is_str[j]
+        values = [r.get(col) for r in rows]
+        allowed = (str, type(None)) if is_str else (int, bool, float, type(None))
+        types = set(map(type, values))
+        if not types <= set(allowed):
+            for i, v in enumerate(values):
+                if not isinstance(v, allowed):
+                    errors.add(i, col, f"expected {'a string' if is_str else 'an integer'}, got {v!r}")
+            return np.full(len(values), -1, dtype=np.int64)
+        if float in types:
+            for i, v in enumerate(values):
+                if type(v) is float and not v.is_integer():
+                    errors.add(i, col, f"expected an integer, got {v!r}")
+        fill = self.cat_fill[j]
+        # catégorie inconnue : -1 (colonnes one-hot à zéro, comme handle_unknown="ignore")
+        return np.fromiter((fill if v is None else index.get(v, -1) for v in values),
+                           dtype=np.int64, count=len(values))
+
+    def decode(self, examples):
+        """
+        `examples` (liste d'objets JSON) -> (num, cat) : num float64 (n, n_num)
+        déjà imputé et standardisé, cat int64 (n, n_cat) index de catégorie
+        (-1 : inconnue). Champ absent ou null : imputé comme à l'entraînement.
+        Lève ExamplesError avec la ligne et le champ fautifs.
+        """
+        errors = _Errors()
+        if not isinstance(examples, list):
+            errors.add(None, "", f"expected a list of objects, got {type(examples).__name__}")
+            errors.raise_if_any()
+        rows = examples
+        if not all(type(r) is dict for r in rows):
+            rows = []
+            for i, r in enumerate(examples):
+                if type(r) is dict:
+                    rows.append(r)
+                else:
+                    errors.add(i, "", f"expected an object, got {type(r).__name__}")
+                    rows.append({})
+
+        n = len(rows)
+        num = np.empty((n, len(self.num_cols)), dtype=np.float64)
+        for j, col in enumerate(self.num_cols):
+            num[:, j] = self._numeric(rows, col, errors)
+        cat = np.empty((n, len(self.cat_cols)), dtype=np.int64)
+        for j in range(len(self.cat_cols)):
+            cat[:, j] = self._categorical(rows, j, errors)
+        errors.raise_if_any()
+
+        missing = np.isnan(num)
+        if missing.any():
+            num = np.where(missing, self.num_fill, num)
+        num -= self.num_mean
+        num /= self.num_scale
+        return num, cat
+
+    # ---- transformation / prédiction ----
+    def transform(self, num, cat):
+        """Matrice creuse identique à celle du ColumnTransformer ajusté."""
+        n, n_num = num.shape
+        known = cat >= 0
+        cols = np.where(known, cat + self.cat_offset, -1)
+        # par ligne : les colonnes numériques puis les one-hot connues
+        indices = np.concatenate([np.broadcast_to(np.arange(n_num), (n, n_num)), cols], axis=1)
+        data = np.concatenate([num, known.astype(np.float64)], axis=1)
+        keep = np.concatenate([np.ones((n, n_num), dtype=bool), known], axis=1)
+        indptr = np.concatenate([[0], np.cumsum(keep.sum(axis=1))])
+        return sp.csr_matrix((data[keep], indices[keep], indptr), shape=(n, self.n_features))
+
+    def predict_proba(self, num, cat):
+        return self.clf.predict_proba(self.transform(num, cat))[:, 1]
+
+
+def athlete_fastpath(bundle, model_file: str):
+    """AthleteFastPath du modèle `model_file` du bundle (compilé une fois), None si non compilable."""
+
+    def build(b):
+        try:
+            return AthleteFastPath(b[model_file])
+        except (UnsupportedPipeline, AttributeError) as e:
+            print(f"[warn] chemin rapide athlètes indisponible, retour au DataFrame: {e}")
+            return None
+
+    return bundle.derived(f"fastpath:{model_file}", build)
@@ -0,0 +1,215 @@
+# models/registry.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import joblib
+
+MANIFEST_SUFFIX = ".manifest.json"
+BUNDLES_DIR = "bundles"
+
+
+def dump_atomic(obj, path: str):
+    """
+    joblib.dump vers un fichier temporaire puis os.replace : un lecteur voit
+    soit l'ancien artefact complet, soit le nouveau, jamais un fichier à moitié écrit.
+    """
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        joblib.dump(obj, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_json_atomic(obj, path: str):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class ModelBundle:
+    """
+    Ensemble d'artefacts chargés ensemble (ex: scaler + 3 modèles pays).
+    `version` est un hash court du contenu des fichiers : deux process qui
+    chargent la même publication annoncent la même version.
+    """
+
+    def __init__(self, name: str, models: dict, version: str, signature: tuple):
+        self.name = name
+        self.models = models
+        self.version = version
+        self.signature = signature
+        self.loaded_at = time.time()
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, filename: str):
+        return self.models[filename]
+
+    def derived(self, key: str, build):
+        """
+        Objet calculé une seule fois à partir des artefacts du bundle (ex: chemin
+        d'inférence compilé) ; un nouveau bundle (réentraînement) repart de zéro.
+        """
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+
+class ModelRegistry:
+    """
+    Charge chaque artefact une seule fois et sert les modèles depuis la mémoire.
+
+    Un bundle est publié en une fois (`publish`) : ses fichiers sont écrits
+    dans un dossier versionné (bundles/<nom>/<version>/), puis le manifeste
+    <nom>.manifest.json qui les liste est remplacé en dernier (os.replace).
+    Un lecteur, dans ce process ou un autre, voit donc soit l'ancien
+    ensemble complet, soit le nouveau, jamais un mélange. `get` ne compare
+    que le manifeste ; une requête en cours garde le bundle qu'elle a obtenu.
+    Sans manifeste (artefacts d'avant ce format), les fichiers sont lus à la
+    racine de artifacts_dir.
+    """
+
+    # versions gardées sur disque : un autre process peut être en train de charger la précédente
+    KEEP_VERSIONS = 2
+
+    def __init__(self, artifacts_dir: str):
+        self.artifacts_dir = artifacts_dir
+        self._lock = threading.Lock()
+        self._bundles = {}
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.artifacts_dir, f"{name}{MANIFEST_SUFFIX}")
+
+    def _bundle_dir(self, name: str) -> str:
+        return os.path.join(self.artifacts_dir, BUNDLES_DIR, name)
+
+    def _signature(self, name: str, files):
+        try:
+            st = os.stat(self._manifest_path(name))
+            return ("manifest", st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            sig = []
+            for f in files:
+                st = os.stat(os.path.join(self.artifacts_dir, f))
+                sig.append((f, st.st_size, st.st_mtime_ns))
+            return tuple(sig)
+
+    def exists(self, name: str, files) -> bool:
+        """Le bundle est publié (manifeste) ou tous ses fichiers existent à l'ancien format."""
+        return (os.path.exists(self._manifest_path(name))
+                or all(os.path.exists(os.path.join(self.artifacts_dir, f)) for f in files))
+
+    def _load_manifest(self, name: str, files) -> ModelBundle:
+        with open(self._manifest_path(name), "r", encoding="utf-8") as fh:
+            st = os.fstat(fh.fileno())
+            manifest = json.load(fh)
+        missing = [f for f in files if f not in manifest["files"]]
+        if missing:
+            raise FileNotFoundError(f"{name}: {', '.join(missing)} absent(s) du manifeste")
+        models = {f: joblib.load(os.path.join(self.artifacts_dir, manifest["files"][f])) for f in files}
+        signature = ("manifest", st.st_ino, st.st_size, st.st_mtime_ns)
+        return ModelBundle(name, models, manifest["version"], signature)
+
+    def _load(self, name: str, files) -> ModelBundle:
+        if os.path.exists(self._manifest_path(name)):
+            try:
+                return self._load_manifest(name, files)
+            except FileNotFoundError:
+                # version supprimée entre la lecture du manifeste et celle des fichiers : on relit
+                return self._load_manifest(name, files)
+        signature = self._signature(name, files)
+        h = hashlib.sha256()
+        models = {}
+        for f in files:
+            path = os.path.join(self.artifacts_dir, f)
+            with open(path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    h.update(chunk)
+            models[f] = joblib.load(path)
+        return ModelBundle(name, models, h.hexdigest()[:12], signature)
+
+    def get(self, name: str, files) -> ModelBundle:
+        """
+        Retourne le bundle `name` (chargé au premier appel). Si le manifeste a
+        changé sur disque depuis (autre process, réentraînement), on recharge.
+        """
+        files = tuple(files)
+        bundle = self._bundles.get(name)
+        if bundle is not None and bundle.signature == self._signature(name, files):
+            return bundle
+        return self.reload(name, files)
+
+    def reload(self, name: str, files) -> ModelBundle:
+        files = tuple(files)
+        with self._lock:
+            # une autre requête a pu recharger pendant qu'on attendait le verrou
+            bundle = self._bundles.get(name)
+            if bundle is not None and bundle.signature == self._signature(name, files):
+                return bundle
+            bundle = self._load(name, files)
+            self._bundles[name] = bundle
+        return bundle
+
+    def publish(self, name: str, objects: dict) -> ModelBundle:
+        """
+        Écrit les artefacts `objects` ({nom de fichier: objet}) comme nouvelle
+        version du bundle, bascule le manifeste, puis recharge ce process.
+        """
+        bundle_dir = self._bundle_dir(name)
+        os.makedirs(bundle_dir, exist_ok=True)
+        staging = os.path.join(bundle_dir, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        os.makedirs(staging, exist_ok=True)
+        try:
+            h = hashlib.sha256()
+            for f, obj in objects.items():
+                path = os.path.join(staging, f)
+                joblib.dump(obj, path)
+                h.update(f.encode("utf-8"))
+                with open(path, "rb") as fh:
+                    for chunk in iter(lambda: fh.read(1 << 20), b""):
+                        h.update(chunk)
+            version = h.hexdigest()[:12]
+            final = os.path.join(bundle_dir, f"{time.time_ns()}-{version}")
+            os.replace(staging, final)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        rel = os.path.relpath(final, self.artifacts_dir)
+        manifest = {"version": version, "files": {f: os.path.join(rel, f) for f in objects}}
+        _write_json_atomic(manifest, self._manifest_path(name))
+        self._prune(name, keep=os.path.basename(final))
+        return self.reload(name, objects)
+
+    def _prune(self, name: str, keep: str):
+        bundle_dir = self._bundle_dir(name)
+        versions = sorted((d for d in os.listdir(bundle_dir) if not d.startswith(".")), reverse=True)
+        old = [d for d in versions if d != keep][self.KEEP_VERSIONS - 1:]
+        for d in old:
+            shutil.rmtree(os.path.join(bundle_dir, d), ignore_errors=True)
+
+    def versions(self) -> dict:
+        return {name: b.version for name, b in self._bundles.items()}
+
+
+_REGISTRIES = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_registry(artifacts_dir: str) -> ModelRegistry:
+    key = os.path.abspath(artifacts_dir)
+    with _REGISTRIES_LOCK:
+        reg = _REGISTRIES.get(key)
+        if reg is None:
+            reg = _REGISTRIES[key] = ModelRegistry(artifacts_dir)
+        return reg
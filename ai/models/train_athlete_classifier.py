@@ -26,6 +26,8 @@ from sklearn.impute import SimpleImputer
 from sklearn.linear_model import LogisticRegression
 
 from .utils import features_athletes_from_json
+from .registry import get_registry
+from .athlete_fastpath import athlete_fastpath
 
 MODEL_PATH = "athlete_classifier.joblib"
 PREPROC_PATH = "preproc_athlete.pkl"
@@ -106,8 +108,7 @@ def ensure_athlete_model(data_dir: str, artifacts_dir: str, force_retrain: bool
     Entraîne le classifieur athlètes sur les VRAIES features construites
     par build_athlete_features() et sauvegarde le pipeline sklearn.
     """
-    path = os.path.join(artifacts_dir, MODEL_PATH)
-    if os.path.exists(path) and not force_retrain:
+    if get_registry(artifacts_dir).exists("athletes", [MODEL_PATH]) and not force_retrain:
         return
 
     df = build_athlete_features(data_dir)
@@ -147,14 +148,121 @@ def ensure_athlete_model(data_dir: str, artifacts_dir: str, force_retrain: bool
         print(f"[warn] Évaluation test athlètes sautée: {e}")
 
     os.makedirs(artifacts_dir, exist_ok=True)
-    joblib.dump(model, path)
+    get_registry(artifacts_dir).publish("athletes", {MODEL_PATH: model})
 
 
-def predict_athletes_batch(artifacts_dir: str, df_examples: pd.DataFrame):
-    model = joblib.load(os.path.join(artifacts_dir, MODEL_PATH))
-    proba = model.predict_proba(df_examples)[:, 1]
-    pred = (proba >= 0.5).astype(int)
-    out = df_examples.copy()
-    out["proba_medal"] = proba
-    out["pred_medal"] = pred
-    return {"count": len(out), "predictions": out.to_dict(orient="records")}
+def _athletes_response(df_examples: pd.DataFrame, proba: np.ndarray, version: str, columnar: bool = False) -> dict:
+    """
+    Réponse de prédiction. Par défaut une liste d'objets (un par exemple) ;
+    avec `columnar`, un tableau par champ ({"age": [...], "proba_medal": [...]}),
+    plus compact et bien plus rapide à encoder pour les gros lots.
+    Les colonnes sont converties en listes Python d'un coup (tolist) plutôt
+    que ligne à ligne comme DataFrame.to_dict(orient="records").
+    """
+    cols = {c: df_examples[c].tolist() for c in df_examples.columns}
+    cols["proba_medal"] = proba.tolist()
+    cols["pred_medal"] = (proba >= 0.5).astype(int).tolist()
+    out = {"count": len(df_examples), "model_version": version}
+    if columnar:
+        out.update(format="columns", columns=cols)
+    else:
+        names = list(cols)
+        out["predictions"] = [dict(zip(names, row)) for row in zip(*cols.values())]
+    return out
+
+
+def predict_athletes_batch(artifacts_dir: str, df_examples: pd.DataFrame, columnar: bool = False):
+    bundle = get_registry(artifacts_dir).get("athletes", [MODEL_PATH])
+    model = bundle[MODEL_PATH]
+    proba = model.predict_proba(df_examples)[:, 1] if len(df_examples) else np.empty(0)
+    return _athletes_response(df_examples, proba, bundle.version, columnar=columnar)
+
+
+def _examples_response(examples: list, proba: np.ndarray, version: str, columnar: bool = False) -> dict:
+    """Même réponse que _athletes_response, construite directement depuis les objets JSON reçus."""
+    names = list(dict.fromkeys(k for ex in examples for k in ex))
+    pred = (proba >= 0.5).astype(int).tolist()
+    proba = proba.tolist()
+    out = {"count": len(examples), "model_version": version}
+    if columnar:
+        cols = {k: [ex.get(k) for ex in examples] for k in names}
+        cols["proba_medal"] = proba
+        cols["pred_medal"] = pred
+        out.update(format="columns", columns=cols)
+    else:
+        blank = dict.fromkeys(names)
+        out["predictions"] = [{**blank, **ex, "proba_medal": p, "pred_medal": d}
+                              for ex, p, d in zip(examples, proba, pred)]
+    return out
+
+
+def predict_athletes_examples(artifacts_dir: str, examples: list, columnar: bool = False):
+    """
+    /predict/athletes : exemples JSON décodés directement en tableaux NumPy
+    (cf. athlete_fastpath), sans DataFrame. Exemples invalides : ExamplesError.
+    Si le pipeline n'est pas compilable, on repasse par predict_athletes_batch.
+    """
+    bundle = get_registry(artifacts_dir).get("athletes", [MODEL_PATH])
+    fast = athlete_fastpath(bundle, MODEL_PATH)
+    if fast is None:
+        return predict_athletes_batch(artifacts_dir, pd.DataFrame(examples), columnar=columnar)
+    num, cat = fast.decode(examples)
+    proba = fast.predict_proba(num, cat) if len(examples) else np.empty(0)
+    return _examples_response(examples, proba, bundle.version, columnar=columnar)
+
+
+def predict_athletes_many(artifacts_dir: str, batches, columnar=None):
+    """
+    Plusieurs requêtes en un seul predict_proba (cf. serving.MicroBatcher) :
+    les exemples de chaque requête sont décodés (athlete_fastpath), concaténés,
+    prédits ensemble puis rendus à chaque requête, avec la même réponse que
+    predict_athletes_examples. Le pipeline traite chaque ligne indépendamment,
+    le regroupement ne change rien aux probas. Une requête invalide fait
+    échouer le lot, que MicroBatcher rejoue alors requête par requête.
+    `columnar` : format de réponse de chaque requête (liste de booléens, défaut : objets).
+    """
+    bundle = get_registry(artifacts_dir).get("athletes", [MODEL_PATH])
+    columnar = columnar or [False] * len(batches)
+    fast = athlete_fastpath(bundle, MODEL_PATH)
+    if fast is None:
+        return _predict_frames_many(bundle, [pd.DataFrame(b) for b in batches], columnar)
+
+    decoded = [fast.decode(b) for b in batches if len(b)]
+    # requêtes vides : réponse vide, predict_proba refuse un tableau de 0 ligne
+    proba = np.empty(0)
+    if decoded:
+        proba = fast.predict_proba(np.concatenate([num for num, _ in decoded]),
+                                   np.concatenate([cat for _, cat in decoded]))
+    out = []
+    start = 0
+    for examples, is_columnar in zip(batches, columnar):
+        n = len(examples)
+        out.append(_examples_response(examples, proba[start:start + n], bundle.version, columnar=is_columnar))
+        start += n
+    return out
+
+
+def _predict_frames_many(bundle, frames, columnar):
+    """
+    Version DataFrame de predict_athletes_many (pipeline non compilable).
+    Les requêtes sont groupées par jeu de colonnes : une requête à qui il
+    manque une colonne échoue comme si elle était seule, sans NaN comblés par les autres.
+    """
+    model = bundle[MODEL_PATH]
+    groups = {}
+    out = [None] * len(frames)
+    for i, df in enumerate(frames):
+        if not len(df):
+            out[i] = _athletes_response(df, np.empty(0), bundle.version, columnar=columnar[i])
+            continue
+        groups.setdefault(frozenset(df.columns), []).append(i)
+
+    for idx in groups.values():
+        X = pd.concat([frames[i] for i in idx], ignore_index=True, sort=False)
+        proba = model.predict_proba(X)[:, 1]
+        start = 0
+        for i in idx:
+            n = len(frames[i])
+            out[i] = _athletes_response(frames[i], proba[start:start + n], bundle.version, columnar=columnar[i])
+            start += n
+    return out
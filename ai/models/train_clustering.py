@@ -1,4 +1,9 @@
 import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import joblib
 import numpy as np
 import pandas as pd
@@ -6,10 +11,25 @@ import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.cluster import KMeans
+from sklearn.base import clone
 
-from .utils import read_medals, read_hosts, build_country_panel
+from features.feature_store import get_feature_store
+from .registry import get_registry, dump_atomic
+from .eval import evaluate_clustering
 
 CLUST_PATH = "clustering.pkl"
+CLUST_CACHE_DIR = "clusters"
+CLUST_CACHE_SIZE = int(os.environ.get("CLUST_CACHE_SIZE", 64))
+# fichiers gardés dans artifacts/clusters/<version des données>/ (les plus anciens utilisés sont supprimés)
+CLUST_DISK_SIZE = int(os.environ.get("CLUST_DISK_SIZE", 256))
+
+# Pipelines ajustés (scaler + PCA + KMeans) et leurs résultats, en LRU
+_fit_cache = OrderedDict()
+_fit_cache_lock = threading.Lock()
+
+# Pool de threads pour les balayages de k (créé au premier besoin, taille fixe)
+_sweep_pool = None
+_sweep_pool_lock = threading.Lock()
 
 def _build_matrix_for_year(panel: pd.DataFrame, year: int, season: str="Summer"):
     df = (panel[(panel["Year"] <= year) & (panel["Season"] == season)]
@@ -20,27 +40,206 @@ def _build_matrix_for_year(panel: pd.DataFrame, year: int, season: str="Summer")
     return X, meta
 
 def ensure_clustering_model(data_dir: str, artifacts_dir: str, force_retrain: bool=False):
-    path = os.path.join(artifacts_dir, CLUST_PATH)
-    if os.path.exists(path) and not force_retrain:
+    registry = get_registry(artifacts_dir)
+    if registry.exists("clustering", [CLUST_PATH]) and not force_retrain:
         return
     # On sauve juste les objets de prétraitement partagés; K variable sera ajusté à la demande
-    joblib.dump({"scaler": StandardScaler(), "pca": PCA(n_components=3, random_state=42)}, path)
+    os.makedirs(artifacts_dir, exist_ok=True)
+    registry.publish("clustering", {CLUST_PATH: {"scaler": StandardScaler(), "pca": PCA(n_components=3, random_state=42)}})
 
-def cluster_countries(data_dir: str, artifacts_dir: str, year: int, k: int, season: str="Summer"):
-    medals = read_medals(data_dir)
-    hosts = read_hosts(data_dir)
-    panel = build_country_panel(medals, hosts)
+def clear_cluster_cache():
+    with _fit_cache_lock:
+        _fit_cache.clear()
 
-    pre = joblib.load(os.path.join(artifacts_dir, CLUST_PATH))
-    scaler, pca = pre["scaler"], pre["pca"]
+def _data_version(data_dir: str, artifacts_dir: str) -> str:
+    """Version des entrées : fichiers de données + objets de prétraitement."""
+    store_fp = get_feature_store(data_dir).fingerprint()
+    pre_version = get_registry(artifacts_dir).get("clustering", [CLUST_PATH]).version
+    return hashlib.sha256(repr((store_fp, pre_version)).encode("utf-8")).hexdigest()[:12]
 
+def _project(panel: pd.DataFrame, pre: dict, year: int, season: str):
+    """Matrice standardisée + PCA pour une année ; partagée par tous les k."""
     X, meta = _build_matrix_for_year(panel, year=year, season=season)
-    Z = scaler.fit_transform(X)
-    Zp = pca.fit_transform(Z)
+    scaler, pca = clone(pre["scaler"]), clone(pre["pca"])
+    Zp = pca.fit_transform(scaler.fit_transform(X))
+    return Zp, meta, scaler, pca
+
+def _fit_clusters(data_dir: str, artifacts_dir: str, year: int, k: int, season: str) -> dict:
+    panel = get_feature_store(data_dir).country_panel()
+
+    # objets non ajustés partagés : clonés dans _project pour ne pas les ajuster en place
+    pre = get_registry(artifacts_dir).get("clustering", [CLUST_PATH])[CLUST_PATH]
+    Zp, meta, scaler, pca = _project(panel, pre, year=year, season=season)
 
     kmeans = KMeans(n_clusters=k, n_init="auto", random_state=42)
     labels = kmeans.fit_predict(Zp)
     centers = kmeans.cluster_centers_.tolist()
 
     meta["cluster"] = labels
-    return meta.to_dict(orient="records"), centers
\ No newline at end of file
+    return {
+        "scaler": scaler, "pca": pca, "kmeans": kmeans,
+        "labels": meta.to_dict(orient="records"), "centers": centers,
+    }
+
+def _load_persisted(path: str):
+    try:
+        fitted = joblib.load(path)
+    except FileNotFoundError:  # absent, ou supprimé entre-temps par un autre process
+        return None
+    os.utime(path)  # mtime = dernier usage, pour _prune_persisted
+    return fitted
+
+def _prune_persisted(artifacts_dir: str, version: str):
+    """
+    Cache disque borné : supprime les dossiers des anciennes versions des
+    données, puis les fichiers les moins récemment utilisés au-delà de CLUST_DISK_SIZE.
+    """
+    root = os.path.join(artifacts_dir, CLUST_CACHE_DIR)
+    for entry in os.listdir(root):
+        if entry != version:
+            old = os.path.join(root, entry)
+            if os.path.isdir(old):
+                shutil.rmtree(old, ignore_errors=True)
+            else:
+                try:
+                    os.remove(old)  # fichiers à plat de l'ancien format
+                except FileNotFoundError:
+                    pass
+    cache_dir = os.path.join(root, version)
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".tmp"):  # écriture en cours (dump_atomic)
+            continue
+        try:
+            entries.append((os.stat(os.path.join(cache_dir, name)).st_mtime_ns, name))
+        except FileNotFoundError:
+            continue
+    for _, name in sorted(entries)[:max(0, len(entries) - CLUST_DISK_SIZE)]:
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+
+def cluster_countries(data_dir: str, artifacts_dir: str, year: int, k: int, season: str="Summer",
+                      persist: bool=False):
+    """
+    Clustering KMeans des pays. Le pipeline ajusté est mis en cache (LRU borné
+    à CLUST_CACHE_SIZE) par (year, season, k, version des données) ; avec
+    `persist=True` il est aussi relu / écrit dans artifacts/clusters/<version>/
+    (borné lui aussi, cf. _prune_persisted).
+    """
+    key = (year, season, k, _data_version(data_dir, artifacts_dir))
+    with _fit_cache_lock:
+        fitted = _fit_cache.get(key)
+        if fitted is not None:
+            _fit_cache.move_to_end(key)
+
+    if fitted is None:
+        cache_dir = os.path.join(artifacts_dir, CLUST_CACHE_DIR, key[3])
+        path = os.path.join(cache_dir, f"{season.lower()}_{year}_k{k}.joblib")
+        if persist:
+            fitted = _load_persisted(path)
+        if fitted is None:
+            fitted = _fit_clusters(data_dir, artifacts_dir, year=year, k=k, season=season)
+            if persist:
+                os.makedirs(cache_dir, exist_ok=True)
+                dump_atomic(fitted, path)
+                _prune_persisted(artifacts_dir, key[3])
+        with _fit_cache_lock:
+            _fit_cache[key] = fitted
+            _fit_cache.move_to_end(key)
+            while len(_fit_cache) > CLUST_CACHE_SIZE:
+                _fit_cache.popitem(last=False)
+
+    # copies : l'appelant peut modifier sa réponse sans toucher au cache
+    return [dict(r) for r in fitted["labels"]], [list(c) for c in fitted["centers"]]
+
+
+# ----------------------------------------------------
+# Balayage de k (méthode du coude + silhouette)
+# ----------------------------------------------------
+def _score_k(Zp: np.ndarray, k: int):
+    kmeans = KMeans(n_clusters=k, n_init="auto", random_state=42)
+    labels = kmeans.fit_predict(Zp)
+    sil = None
+    if 2 <= k < len(Zp):
+        sil = float(evaluate_clustering(Zp, labels)["Silhouette_Score"])
+    return k, float(kmeans.inertia_), sil
+
+def _get_sweep_pool():
+    """
+    Pool partagé d'os.cpu_count() threads, jamais remplacé : un balayage en
+    cours peut toujours y soumettre. Chaque appel borne lui-même le nombre de
+    ses tâches en vol (cf. sweep_clusters).
+    Threads plutôt que process : KMeans et la silhouette libèrent le GIL, et
+    un process "spawn" réimporterait __main__ (tout le démarrage de app.py).
+    """
+    global _sweep_pool
+    with _sweep_pool_lock:
+        if _sweep_pool is None:
+            _sweep_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="k-sweep")
+        return _sweep_pool
+
+def sweep_clusters(data_dir: str, artifacts_dir: str, years, ks, season: str="Summer",
+                   max_workers: int=None):
+    """
+    Évalue plusieurs k (inertie + silhouette) sur une ou plusieurs années.
+    Une seule matrice standardisée / PCA par année, partagée par tous les k ;
+    les KMeans tournent en parallèle dans un pool de threads (max_workers=1 : en série).
+    """
+    panel = get_feature_store(data_dir).country_panel()
+    pre = get_registry(artifacts_dir).get("clustering", [CLUST_PATH])[CLUST_PATH]
+
+    matrices = {}
+    for year in years:
+        Zp, _, _, _ = _project(panel, pre, year=year, season=season)
+        matrices[year] = Zp
+
+    tasks = [(year, k) for year in years for k in ks if 1 <= k <= len(matrices[year])]
+    workers = max_workers or min(len(tasks), os.cpu_count() or 1) or 1
+    if workers == 1:
+        scores = [_score_k(matrices[y], k) for y, k in tasks]
+    else:
+        pool = _get_sweep_pool()
+        # au plus `workers` tâches de cet appel en vol dans le pool partagé
+        slots = threading.BoundedSemaphore(workers)
+        futures = []
+        for y, k in tasks:
+            slots.acquire()
+            future = pool.submit(_score_k, matrices[y], k)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+        scores = [f.result() for f in futures]
+
+    by_year = {year: [] for year in years}
+    for (year, _), (k, inertia, sil) in zip(tasks, scores):
+        by_year[year].append({"k": k, "inertia": round(inertia, 2), "silhouette": sil})
+
+    results = []
+    for year in years:
+        inertias = [r["inertia"] for r in by_year[year]]
+        results.append({"year": year, "n_countries": int(len(matrices[year])),
+                        "inertia_list": inertias, "scores": by_year[year]})
+    return {"season": season, "ks": list(ks), "results": results}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Balayage de k pour le clustering des pays")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--artifacts-dir", default="artifacts")
+    parser.add_argument("--years", default="2020", help="ex: 2012,2016,2020")
+    parser.add_argument("--k-min", type=int, default=2)
+    parser.add_argument("--k-max", type=int, default=10)
+    parser.add_argument("--season", default="Summer")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    ensure_clustering_model(args.data_dir, args.artifacts_dir)
+    out = sweep_clusters(args.data_dir, args.artifacts_dir,
+                         years=[int(y) for y in args.years.split(",")],
+                         ks=list(range(args.k_min, args.k_max + 1)),
+                         season=args.season.title(), max_workers=args.workers)
+    print(json.dumps(out, indent=2))
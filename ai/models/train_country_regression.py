@@ -1,5 +1,7 @@
 import os
+import time
 import joblib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 
@@ -7,52 +9,92 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import PoissonRegressor
 
-# ✅ on importe seulement notre builder final
-from features.build_country_features import build_country_features
+# ✅ on importe seulement notre builder final (servi depuis le feature store)
+from features.feature_store import get_feature_store
+from .registry import get_registry
 
 # chemins de sauvegarde
 GOLD_PATH = "country_gold.joblib"
 SILVER_PATH = "country_silver.joblib"
 BRONZE_PATH = "country_bronze.joblib"
 SCALER_PATH = "scaler_country.pkl"
+FORECAST_PATH = "country_forecast.joblib"
+MODEL_FILES = [SCALER_PATH, GOLD_PATH, SILVER_PATH, BRONZE_PATH]
+COUNTRY_FILES = MODEL_FILES + [FORECAST_PATH]
+
+# budget de cœurs pour l'entraînement (défaut : tous)
+TRAIN_N_JOBS = max(1, int(os.environ.get("TRAIN_N_JOBS", 0)) or os.cpu_count() or 1)
 
 
 # ----------------------------------------------------
 # 1️⃣ Fonction d'entraînement interne
 # ----------------------------------------------------
-def _fit_models(X, y_gold, y_silver, y_bronze):
+def _timed_fit(model, X, y):
+    t0 = time.perf_counter()
+    model.fit(X, y)
+    return model, round(time.perf_counter() - t0, 3)
+
+
+def _fit_models(X, y_gold, y_silver, y_bronze, n_jobs: int = None):
     """
     Entraîne trois modèles séparés (Gold, Silver, Bronze)
     sur les mêmes features.
+    Les trois cibles sont ajustées en parallèle (threads : les fits sklearn
+    libèrent le GIL) ; la forêt utilise le reste du budget `n_jobs` pour
+    ses arbres. Retourne aussi la durée de chaque fit (secondes).
     """
+    if n_jobs is not None and n_jobs < 1:
+        raise ValueError(f"n_jobs doit être >= 1 (reçu {n_jobs})")
+    n_jobs = n_jobs or TRAIN_N_JOBS
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
-    m_gold   = RandomForestRegressor(n_estimators=400, random_state=42)
+    # GB et Poisson occupent un cœur chacun pendant que la forêt tourne
+    rf_jobs = max(1, n_jobs - 2) if n_jobs >= 3 else 1
+    m_gold   = RandomForestRegressor(n_estimators=400, random_state=42, n_jobs=rf_jobs)
     m_silver = GradientBoostingRegressor(n_estimators=500, learning_rate=0.05, random_state=42)
     m_bronze = PoissonRegressor(alpha=1.0, max_iter=500)
 
-    m_gold.fit(X_scaled, y_gold)
-    m_silver.fit(X_scaled, y_silver)
-    m_bronze.fit(X_scaled, y_bronze)
-
-    return scaler, m_gold, m_silver, m_bronze
+    t0 = time.perf_counter()
+    jobs = [(m_gold, y_gold), (m_silver, y_silver), (m_bronze, y_bronze)]
+    with ThreadPoolExecutor(max_workers=min(3, n_jobs)) as pool:
+        fitted = list(pool.map(lambda job: _timed_fit(job[0], X_scaled, job[1]), jobs))
+    (m_gold, t_gold), (m_silver, t_silver), (m_bronze, t_bronze) = fitted
+    # au service, un seul thread par predict : sinon chaque requête de chaque worker
+    # ouvrirait son propre pool joblib de rf_jobs threads
+    m_gold.set_params(n_jobs=1)
+
+    timings = {
+        "gold": t_gold,
+        "silver": t_silver,
+        "bronze": t_bronze,
+        "total": round(time.perf_counter() - t0, 3),
+        "n_jobs": n_jobs,
+    }
+    return scaler, m_gold, m_silver, m_bronze, timings
 
 
 # ----------------------------------------------------
 # 2️⃣ Entraînement et sauvegarde des modèles
 # ----------------------------------------------------
-def ensure_country_models(data_dir: str, artifacts_dir: str, force_retrain: bool = False):
+def ensure_country_models(data_dir: str, artifacts_dir: str, force_retrain: bool = False, n_jobs: int = None):
     """
     Construit les features pays et entraîne les modèles
     pour prédire les médailles Gold/Silver/Bronze.
+    Matérialise aussi le classement prévisionnel (cf. build_forecast_table).
+    Retourne les durées de fit si un entraînement a eu lieu, sinon None.
     """
-    gold_f = os.path.join(artifacts_dir, GOLD_PATH)
-    if all(os.path.exists(os.path.join(artifacts_dir, p)) for p in [GOLD_PATH, SILVER_PATH, BRONZE_PATH, SCALER_PATH]) and not force_retrain:
-        return  # les modèles existent déjà
+    registry = get_registry(artifacts_dir)
+    if registry.exists("country", MODEL_FILES) and not force_retrain:
+        if not registry.exists("country", COUNTRY_FILES):
+            # modèles déjà là (anciens artefacts) : on calcule seulement la table
+            models = [joblib.load(os.path.join(artifacts_dir, p)) for p in MODEL_FILES]
+            forecast = build_forecast_table(data_dir, *models)
+            registry.publish("country", {**dict(zip(MODEL_FILES, models)), FORECAST_PATH: forecast})
+        return None  # les modèles existent déjà
 
     # 🔹 on construit le dataset complet
-    df = build_country_features(data_dir)
+    df = get_feature_store(data_dir).country_features()
 
     # 🔹 on définit X et les cibles
     target_cols = ["Gold", "Silver", "Bronze"]
@@ -63,16 +105,93 @@ def ensure_country_models(data_dir: str, artifacts_dir: str, force_retrain: bool
     y_silver = df["Silver"].values
     y_bronze = df["Bronze"].values
 
-    scaler, m_gold, m_silver, m_bronze = _fit_models(X, y_gold, y_silver, y_bronze)
+    scaler, m_gold, m_silver, m_bronze, timings = _fit_models(X, y_gold, y_silver, y_bronze, n_jobs=n_jobs)
+    forecast = build_forecast_table(data_dir, scaler, m_gold, m_silver, m_bronze)
 
-    # 🔹 on sauvegarde les modèles
+    # 🔹 on sauvegarde les modèles (publication atomique du bundle + bascule du registry)
     os.makedirs(artifacts_dir, exist_ok=True)
-    joblib.dump(m_gold, os.path.join(artifacts_dir, GOLD_PATH))
-    joblib.dump(m_silver, os.path.join(artifacts_dir, SILVER_PATH))
-    joblib.dump(m_bronze, os.path.join(artifacts_dir, BRONZE_PATH))
-    joblib.dump(scaler, os.path.join(artifacts_dir, SCALER_PATH))
+    registry.publish("country", {
+        GOLD_PATH: m_gold, SILVER_PATH: m_silver, BRONZE_PATH: m_bronze,
+        SCALER_PATH: scaler, FORECAST_PATH: forecast,
+    })
+
+    print("✅ Modèles pays entraînés et sauvegardés.", timings)
+    return timings
+
+
+def _last_known(df: pd.DataFrame, seasons, nocs=None) -> pd.DataFrame:
+    """Dernière ligne connue de chaque (NOC, saison) demandé."""
+    mask = df["Season"].isin(list(seasons))
+    if nocs is not None:
+        mask &= df["NOC"].isin(list(nocs))
+    return (
+        df[mask]
+        .sort_values(["NOC", "Season", "Year"])
+        .groupby(["NOC", "Season"], as_index=False)
+        .tail(1)
+        .reset_index(drop=True)
+    )
+
+
+def _predict_rows(last: pd.DataFrame, scaler, m_gold, m_silver, m_bronze):
+    """
+    Un seul scaler.transform et un seul predict par modèle sur toute la matrice.
+    Seul post-traitement des prédictions pays (médailles entières, jamais
+    négatives) : toutes les routes /predict/* passent par ici.
+    """
+    feature_cols = [c for c in last.columns if
+                    c not in ["Country", "NOC", "Gold", "Silver", "Bronze", "Season", "Year"]]
+    X_scaled = scaler.transform(last[feature_cols])
+
+    preds_gold = np.maximum(0, np.round(m_gold.predict(X_scaled))).astype(int)
+    preds_silver = np.maximum(0, np.round(m_silver.predict(X_scaled))).astype(int)
+    preds_bronze = np.maximum(0, np.round(m_bronze.predict(X_scaled))).astype(int)
+    return preds_gold, preds_silver, preds_bronze
+
+
+def _rank_countries(df: pd.DataFrame, season: str, scaler, m_gold, m_silver, m_bronze) -> pd.DataFrame:
+    """
+    Prédit Gold/Silver/Bronze à partir de la dernière ligne connue de chaque
+    NOC pour `season`, puis trie par total / or / argent (ordre de /predict/top25).
+    """
+    last = _last_known(df, [season])
+    preds_gold, preds_silver, preds_bronze = _predict_rows(last, scaler, m_gold, m_silver, m_bronze)
+
+    ranked = pd.DataFrame({
+        "country_code": last["NOC"].values,
+        "country": last["Country"].values,
+        "pred_gold": preds_gold,
+        "pred_silver": preds_silver,
+        "pred_bronze": preds_bronze,
+        "pred_total": preds_gold + preds_silver + preds_bronze,
+    })
+    # tri
+    return ranked.sort_values(["pred_total", "pred_gold", "pred_silver"], ascending=False).reset_index(drop=True)
+
+
+def _ranked_records(ranked: pd.DataFrame) -> list:
+    # types Python natifs (int, str) pour jsonify, sans iterrows()
+    cols = list(ranked.columns)
+    values = zip(*(ranked[c].tolist() for c in cols))
+    return [dict(zip(cols, v)) for v in values]
+
 
-    print("✅ Modèles pays entraînés et sauvegardés.")
+def build_forecast_table(data_dir: str, scaler, m_gold, m_silver, m_bronze) -> dict:
+    """
+    Classement prévisionnel complet de tous les NOC, par saison.
+    L'année n'entre pas dans les features (seules les dernières perfs connues
+    comptent), donc une table par saison sert n'importe quelle année demandée.
+    `data_fingerprint` permet de détecter des données plus récentes que la table.
+    """
+    store = get_feature_store(data_dir)
+    df = store.country_features()
+    return {
+        "data_fingerprint": store.fingerprint(),
+        "seasons": {
+            season: _ranked_records(_rank_countries(df, season, scaler, m_gold, m_silver, m_bronze))
+            for season in sorted(df["Season"].unique())
+        },
+    }
 
 
 # ----------------------------------------------------
@@ -82,7 +201,7 @@ def predict_country_medals(data_dir: str, artifacts_dir: str, target_noc: str, y
     """
     Prédit les médailles pour un pays donné à une année future.
     """
-    df = build_country_features(data_dir)
+    df = get_feature_store(data_dir).country_features()
 
     # on prend la dernière année connue pour ce pays/saison
     last = df[(df["NOC"] == target_noc) & (df["Season"] == season)].sort_values("Year").tail(1)
@@ -92,21 +211,13 @@ def predict_country_medals(data_dir: str, artifacts_dir: str, target_noc: str, y
     # on met à jour l'année pour la projection
     last["Year"] = year
 
-    # rechargement des modèles
-    scaler = joblib.load(os.path.join(artifacts_dir, SCALER_PATH))
-    m_gold = joblib.load(os.path.join(artifacts_dir, GOLD_PATH))
-    m_silver = joblib.load(os.path.join(artifacts_dir, SILVER_PATH))
-    m_bronze = joblib.load(os.path.join(artifacts_dir, BRONZE_PATH))
-
-    # features
-    feature_cols = [c for c in last.columns if
-                    c not in ["Country", "NOC", "Gold", "Silver", "Bronze", "Season", "Year"]]
-    X = last[feature_cols]
-    X_scaled = scaler.transform(X)
+    # modèles servis depuis la mémoire
+    bundle = get_registry(artifacts_dir).get("country", COUNTRY_FILES)
+    scaler, m_gold, m_silver, m_bronze = (bundle[p] for p in MODEL_FILES)
 
-    pred_gold = int(round(m_gold.predict(X_scaled)[0]))
-    pred_silver = int(round(m_silver.predict(X_scaled)[0]))
-    pred_bronze = int(round(m_bronze.predict(X_scaled)[0]))
+    # même post-traitement que /predict/countries et le top 25 (arrondi, borné à 0)
+    preds_gold, preds_silver, preds_bronze = _predict_rows(last, scaler, m_gold, m_silver, m_bronze)
+    pred_gold, pred_silver, pred_bronze = int(preds_gold[0]), int(preds_silver[0]), int(preds_bronze[0])
     pred_total = pred_gold + pred_silver + pred_bronze
 
     return {
@@ -114,6 +225,7 @@ def predict_country_medals(data_dir: str, artifacts_dir: str, target_noc: str, y
         "season": season,
         "country_code": last["NOC"].iloc[0],
         "country": last["Country"].iloc[0],
+        "model_version": bundle.version,
         "predictions": {
             "gold": pred_gold,
             "silver": pred_silver,
@@ -126,58 +238,90 @@ def predict_country_medals(data_dir: str, artifacts_dir: str, target_noc: str, y
 # ----------------------------------------------------
 # 4️⃣ Fonction de prédiction pour le top 25
 # ----------------------------------------------------
+def forecast_seasons(data_dir: str, artifacts_dir: str) -> list:
+    """Saisons servies par predict_top25 (celles de la table, ou des données si elles ont changé)."""
+    forecast = get_registry(artifacts_dir).get("country", COUNTRY_FILES)[FORECAST_PATH]
+    store = get_feature_store(data_dir)
+    if forecast["data_fingerprint"] == store.fingerprint():
+        return list(forecast["seasons"])
+    return sorted(store.country_features()["Season"].unique())
+
+
 def predict_top25(data_dir: str, artifacts_dir: str, year: int, season: str = "Summer", top_k: int = 25):
     """
     Prédit le top K des pays pour une année donnée.
+    Servi comme une tranche de la table précalculée à l'entraînement ;
+    on ne recalcule que si les données ont changé depuis.
+    Saison inconnue ou top_k < 1 : ValueError.
     """
-    df = build_country_features(data_dir)
+    if top_k < 1:
+        raise ValueError(f"top_k doit être >= 1 (reçu {top_k})")
+    bundle = get_registry(artifacts_dir).get("country", COUNTRY_FILES)
+    forecast = bundle[FORECAST_PATH]
+    records = forecast["seasons"].get(season)
+
+    if records is None or forecast["data_fingerprint"] != get_feature_store(data_dir).fingerprint():
+        df = get_feature_store(data_dir).country_features()
+        if season not in set(df["Season"]):
+            raise ValueError(f"Saison inconnue : {season} (disponibles : {', '.join(sorted(df['Season'].unique()))})")
+        scaler, m_gold, m_silver, m_bronze = (bundle[p] for p in MODEL_FILES)
+        records = _ranked_records(_rank_countries(df, season, scaler, m_gold, m_silver, m_bronze).head(top_k))
 
-    # dernière année connue pour chaque pays
-    last = (
-        df[df["Season"] == season]
-        .sort_values(["NOC", "Year"])
-        .groupby("NOC", as_index=False)
-        .tail(1)
-    )
-    last["Year"] = year
+    return {
+        "year": year,
+        "season": season,
+        "model_version": bundle.version,
+        "top": [dict(r) for r in records[:top_k]],
+    }
 
-    # modèles
-    scaler = joblib.load(os.path.join(artifacts_dir, SCALER_PATH))
-    m_gold = joblib.load(os.path.join(artifacts_dir, GOLD_PATH))
-    m_silver = joblib.load(os.path.join(artifacts_dir, SILVER_PATH))
-    m_bronze = joblib.load(os.path.join(artifacts_dir, BRONZE_PATH))
 
-    # prédictions
-    feature_cols = [c for c in last.columns if
-                    c not in ["Country", "NOC", "Gold", "Silver", "Bronze", "Season", "Year"]]
-    X = last[feature_cols]
-    X_scaled = scaler.transform(X)
+# ----------------------------------------------------
+# 5️⃣ Fonction de prédiction multi-pays (vectorisée)
+# ----------------------------------------------------
+def predict_countries(data_dir: str, artifacts_dir: str, nocs=None, years=(2024,), seasons=("Summer",)):
+    """
+    Prédit les médailles d'une liste de pays (ou de tous si `nocs` est None)
+    pour plusieurs années / saisons, en un seul passage sur les modèles.
+    Les NOC sans historique pour une saison sont listés dans `missing`.
+    """
+    df = get_feature_store(data_dir).country_features()
+    if nocs is not None:
+        nocs = [n.upper() for n in nocs]
+    last = _last_known(df, seasons, nocs)
 
-    preds_gold = np.maximum(0, np.round(m_gold.predict(X_scaled))).astype(int)
-    preds_silver = np.maximum(0, np.round(m_silver.predict(X_scaled))).astype(int)
-    preds_bronze = np.maximum(0, np.round(m_bronze.predict(X_scaled))).astype(int)
-    preds_total = preds_gold + preds_silver + preds_bronze
+    bundle = get_registry(artifacts_dir).get("country", COUNTRY_FILES)
+    scaler, m_gold, m_silver, m_bronze = (bundle[p] for p in MODEL_FILES)
 
-    last["pred_gold"] = preds_gold
-    last["pred_silver"] = preds_silver
-    last["pred_bronze"] = preds_bronze
-    last["pred_total"] = preds_total
+    if last.empty:
+        preds_gold = preds_silver = preds_bronze = np.zeros(0, dtype=int)
+    else:
+        preds_gold, preds_silver, preds_bronze = _predict_rows(last, scaler, m_gold, m_silver, m_bronze)
+
+    # l'année n'est pas une feature : même prédiction pour chaque année demandée
+    rows = list(zip(last["NOC"].tolist(), last["Country"].tolist(), last["Season"].tolist(),
+                    preds_gold.tolist(), preds_silver.tolist(), preds_bronze.tolist()))
+    predictions = [
+        {
+            "year": year,
+            "season": season,
+            "country_code": noc,
+            "country": country,
+            "predictions": {"gold": g, "silver": sv, "bronze": b, "total": g + sv + b},
+        }
+        for year in years
+        for noc, country, season, g, sv, b in rows
+    ]
 
-    # tri
-    top = last.sort_values(["pred_total", "pred_gold", "pred_silver"], ascending=False).head(top_k)
+    missing = []
+    if nocs is not None:
+        found = set(zip(last["NOC"], last["Season"]))
+        missing = [{"country_code": n, "season": se} for se in seasons for n in nocs if (n, se) not in found]
 
     return {
-        "year": year,
-        "season": season,
-        "top": [
-            {
-                "country_code": row["NOC"],
-                "country": row["Country"],
-                "pred_gold": int(row["pred_gold"]),
-                "pred_silver": int(row["pred_silver"]),
-                "pred_bronze": int(row["pred_bronze"]),
-                "pred_total": int(row["pred_total"])
-            }
-            for _, row in top.iterrows()
-        ]
-    }
\ No newline at end of file
+        "years": list(years),
+        "seasons": list(seasons),
+        "model_version": bundle.version,
+        "count": len(predictions),
+        "predictions": predictions,
+        "missing": missing,
+    }
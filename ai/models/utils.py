@@ -2,6 +2,8 @@ import os
 import pandas as pd
 import numpy as np
 
+from olympics_common.dataset_cache import read_excel_cached
+
 def read_medals(data_dir: str) -> pd.DataFrame:
     """
     Adapte le format du fichier olympic_medals.xlsx fourni.
@@ -12,7 +14,7 @@ def read_medals(data_dir: str) -> pd.DataFrame:
     """
     import re
     path = os.path.join(data_dir, "olympic_medals.xlsx")
-    df = pd.read_excel(path)
+    df = read_excel_cached(path)
 
     # 1️⃣ Nettoyage de base
     df.columns = df.columns.str.strip().str.lower()
@@ -66,9 +68,13 @@ def read_medals(data_dir: str) -> pd.DataFrame:
 
 def read_hosts(data_dir: str) -> pd.DataFrame:
     """
-    Doit contenir au moins: game_year, game_season, game_location
+    Doit contenir au moins: game_year, game_season, game_location (+ game_slug si présent)
     """
     path = os.path.join(data_dir, "olympic_hosts.xml")
+    if not os.path.exists(path):
+        print(f"[warn] {path} introuvable : aucun pays hôte, is_host = 0 partout")
+        return pd.DataFrame({"game_slug": pd.Series(dtype=object), "game_year": pd.Series(dtype="int64"),
+                             "game_season": pd.Series(dtype=object), "game_location": pd.Series(dtype=object)})
     hosts = pd.read_xml(path)
     # Harmonise colonnes si besoin
     cols = hosts.columns.str.lower()
@@ -80,30 +86,57 @@ def read_hosts(data_dir: str) -> pd.DataFrame:
     if "game_season" not in hosts.columns and "season" in hosts.columns:
         hosts["game_season"] = hosts["season"]
 
-    keep = [c for c in ["game_year","game_season","game_location"] if c in hosts.columns]
+    keep = [c for c in ["game_slug","game_year","game_season","game_location"] if c in hosts.columns]
     hosts = hosts[keep].drop_duplicates()
     hosts["game_season"] = hosts["game_season"].str.title()
     return hosts
 
-def build_country_panel(df_medals: pd.DataFrame, df_hosts: pd.DataFrame) -> pd.DataFrame:
+# Noms de pays hôtes (olympic_hosts.xml) absents tels quels des médailles
+HOST_NAME_ALIASES = {
+    "USSR": "URS",
+    "United States": "USA",
+    "China": "CHN",
+}
+
+def build_host_index(df_hosts: pd.DataFrame, country_codes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Index (game_slug, Year, Season) -> NOC hôte, une ligne par pays hôte
+    (Melbourne 1956 : AUS et SWE). `country_codes` fournit Country / NOC
+    tels qu'ils apparaissent dans les médailles.
+    A fusionner (merge) plutôt que d'évaluer l'hôte ligne par ligne.
+    """
+    name_to_noc = dict(zip(country_codes["Country"], country_codes["NOC"]))
+    for name, noc in HOST_NAME_ALIASES.items():
+        name_to_noc.setdefault(name, noc)
+
+    cols = [c for c in ["game_slug", "game_year", "game_season", "game_location"] if c in df_hosts.columns]
+    idx = df_hosts[cols].rename(columns={"game_year": "Year", "game_season": "Season"})
+    idx = idx.assign(host_country=idx["game_location"].astype(str).str.split(",")).explode("host_country")
+    idx["host_country"] = idx["host_country"].str.strip()
+    idx["NOC"] = idx["host_country"].map(name_to_noc)
+    idx = idx.dropna(subset=["NOC"])
+    keep = [c for c in ["game_slug", "Year", "Season", "NOC"] if c in idx.columns]
+    return idx[keep].drop_duplicates().reset_index(drop=True)
+
+def flag_hosts(df: pd.DataFrame, host_index: pd.DataFrame, on) -> pd.Series:
+    """Booléen aligné sur `df` : la ligne correspond-elle au pays hôte ? (merge vectorisé)"""
+    keys = host_index[on].drop_duplicates().assign(_is_host=True)
+    flagged = df[on].merge(keys, on=on, how="left")["_is_host"]
+    return pd.Series(flagged.fillna(False).astype(bool).values, index=df.index)
+
+def build_country_panel(df_medals: pd.DataFrame, df_hosts: pd.DataFrame, host_index: pd.DataFrame = None) -> pd.DataFrame:
     """
     Agrège par pays/année/saison et crée des features simples + lags.
+    `host_index` : index déjà construit (cf. FeatureStore.host_index), sinon calculé ici.
     """
     agg = (df_medals
            .groupby(["Year","Season","NOC","Country"], as_index=False)[["Gold","Silver","Bronze","Total"]]
            .sum())
-    # Merge host info
-    hosts = df_hosts.rename(columns={"game_year":"Year","game_season":"Season"})
-    panel = agg.merge(hosts, on=["Year","Season"], how="left")
-    panel["is_host"] = False
-    # s'il existe la colonne host_noc dans tes données, tu peux l'utiliser.
-    # MVP: si Country apparait dans location, on le tag 'host'
-    panel["game_location"] = panel.get("game_location", "")
-    panel["is_host"] = panel.apply(
-        lambda r: (isinstance(r["game_location"], str) and
-                   isinstance(r["Country"], str) and
-                   r["Country"].split()[0] in r["game_location"]), axis=1
-    )
+    # Host info : index (Year, Season) -> NOC hôte
+    panel = agg
+    if host_index is None:
+        host_index = build_host_index(df_hosts, agg[["Country", "NOC"]].drop_duplicates())
+    panel["is_host"] = flag_hosts(panel, host_index, ["Year", "Season", "NOC"])
 
     # Lags par NOC (t-1)
     panel = panel.sort_values(["NOC","Season","Year"]).reset_index(drop=True)
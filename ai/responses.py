@@ -0,0 +1,126 @@
+# responses.py
+import os
+import gzip
+import hashlib
+import functools
+
+from flask import request, make_response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson optionnel : on garde l'encodeur de la stdlib
+    orjson = None
+
+GZIP_MIN_BYTES = int(os.environ.get("GZIP_MIN_BYTES", 1024))
+# niveau 1 : l'essentiel du gain de taille pour une fraction du temps CPU des niveaux élevés
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 1))
+GZIP_ETAG_SUFFIX = "-gz"
+# durée pendant laquelle un client peut resservir une réponse sans revalider (0 : revalide toujours,
+# avec If-None-Match -> 304 tant que données et modèles n'ont pas changé)
+CACHE_MAX_AGE = int(os.environ.get("CACHE_MAX_AGE", 0))
+
+
+def _default(o):
+    # types que orjson ne connaît pas (Timestamp pandas, Decimal, scalaires numpy isolés...)
+    if hasattr(o, "item"):
+        return o.item()
+    if hasattr(o, "isoformat"):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provider JSON de Flask basé sur orjson (encodage et décodage des requêtes
+    plusieurs fois plus rapides, tableaux numpy sérialisés directement).
+    Clés triées comme le provider par défaut : les réponses ne changent pas,
+    à ceci près que NaN / inf deviennent null (JSON valide).
+    """
+
+    OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return self._dump_bytes(obj, indent=bool(kwargs.get("indent"))).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def _dump_bytes(self, obj, indent: bool = False) -> bytes:
+        option = self.OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._dump_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def gzip_response(response):
+    """after_request : gzip des réponses JSON si le client l'accepte (Accept-Encoding)."""
+    if (response.status_code < 200 or response.status_code >= 300
+            or response.direct_passthrough
+            or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    if request.accept_encodings["gzip"] <= 0:
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+    response.headers["Content-Encoding"] = "gzip"
+    tag, weak = response.get_etag()
+    if tag and not weak:
+        # ETag fort : la version compressée est une autre représentation
+        response.set_etag(tag + GZIP_ETAG_SUFFIX)
+    return response
+
+
+def _cache_headers(response, tag: str):
+    response.set_etag(tag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    response.cache_control.must_revalidate = True
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def etag_cached(version):
+    """
+    Décorateur des routes GET dont la réponse ne dépend que des paramètres de
+    la requête, des fichiers de données et des artefacts : `version()` renvoie
+    l'empreinte données + modèles (contenu des fichiers, hash des artefacts).
+    ETag fort = hash(version, chemin + paramètres) ; si le client le renvoie
+    dans If-None-Match, 304 sans rien calculer.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = repr((version(), request.full_path)).encode("utf-8")
+            tag = hashlib.sha256(key).hexdigest()[:32]
+            for candidate in (tag, tag + GZIP_ETAG_SUFFIX):
+                if request.if_none_match.contains(candidate):
+                    return _cache_headers(make_response("", 304), candidate)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _cache_headers(response, tag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def install(app):
+    app.json = FastJSONProvider(app)
+    app.after_request(gzip_response)
+
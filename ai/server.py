@@ -0,0 +1,107 @@
+# server.py
+"""
+Point d'entrée de production : gunicorn (pré-fork) avec --preload.
+
+    python server.py --workers 4 --threads 4 --port 5001 [--async]
+
+Équivaut à `gunicorn --preload --worker-class gthread app:app` avec nos
+réglages : le maître importe app.py une seule fois (features pays + tous
+les artefacts en mémoire, sans entraînement : TRAIN_ON_BOOT=0), gèle le GC
+puis forke les workers. Les workers partagent ces pages en copy-on-write :
+la mémoire par worker reste à peu près constante. gunicorn relance un worker
+qui meurt et gère arrêt / rechargement (SIGTERM, SIGHUP).
+
+Les artefacts sont vérifiés avant l'import : s'il en manque, le démarrage
+échoue en les nommant (rien n'est entraîné ici).
+
+Après un /train/* dans un worker, les autres rechargent le bundle republié
+au prochain appel (cf. ModelRegistry.get) : ce modèle-là n'est plus partagé.
+"""
+import os
+import gc
+import sys
+import argparse
+
+from gunicorn.app.base import BaseApplication
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = os.path.join(HERE, "artifacts")
+
+
+def missing_artifacts(artifacts_dir: str) -> list:
+    """Bundles absents de `artifacts_dir`, avec leurs fichiers manquants."""
+    from models.registry import get_registry
+    from models.train_country_regression import COUNTRY_FILES
+    from models.train_athlete_classifier import MODEL_PATH as ATHLETE_MODEL_PATH
+    from models.train_clustering import CLUST_PATH
+
+    registry = get_registry(artifacts_dir)
+    missing = []
+    for name, files in (("country", COUNTRY_FILES), ("athletes", [ATHLETE_MODEL_PATH]),
+                        ("clustering", [CLUST_PATH])):
+        if not registry.exists(name, files):
+            absent = [f for f in files if not os.path.exists(os.path.join(artifacts_dir, f))]
+            missing.append(f"{name} ({', '.join(absent)})")
+    return missing
+
+
+def load_app(async_mode: bool = False):
+    os.environ["TRAIN_ON_BOOT"] = "0"
+    if async_mode:
+        os.environ["SERVE_ASYNC"] = "1"
+    missing = missing_artifacts(ARTIFACTS_DIR)
+    if missing:
+        sys.exit(f"Artefacts manquants dans {ARTIFACTS_DIR} : {'; '.join(missing)}. "
+                 f"server.py n'entraîne rien au démarrage : lancer d'abord `python app.py` "
+                 f"(TRAIN_ON_BOOT=1) ou les scripts d'entraînement.")
+    import app as app_module
+
+    # objets chargés déplacés hors du suivi du GC : ses passages n'écrivent
+    # plus dans leurs en-têtes, les pages restent partagées après le fork
+    gc.collect()
+    gc.freeze()
+    return app_module.app
+
+
+class PreforkServer(BaseApplication):
+    """gunicorn embarqué : l'application est chargée dans le maître (preload_app)."""
+
+    def __init__(self, options: dict, async_mode: bool = False):
+        self.options = options
+        self.async_mode = async_mode
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return load_app(self.async_mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API IA : gunicorn pré-forké (modèles partagés en copy-on-write)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 2)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WEB_THREADS", 4)),
+                        help="requêtes servies en parallèle par worker (worker gthread)")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("WEB_TIMEOUT", 120)),
+                        help="secondes avant qu'un worker bloqué soit tué et relancé")
+    parser.add_argument("--async", dest="async_mode", action="store_true",
+                        help="calculs dans un pool borné par worker (cf. serving.py)")
+    args = parser.parse_args()
+
+    PreforkServer({
+        "bind": f"{args.host}:{args.port}",
+        "workers": max(1, args.workers),
+        "worker_class": "gthread",
+        "threads": max(1, args.threads),
+        "timeout": args.timeout,
+        "preload_app": True,
+        "accesslog": "-",
+    }, async_mode=args.async_mode).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# serving.py
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import jsonify
+
+# Mode asynchrone : calculs (inférence, clustering, entraînement) hors du thread
+# de la requête, dans des pools bornés, avec un délai maximum par requête.
+SERVE_ASYNC = os.environ.get("SERVE_ASYNC", "0") == "1"
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", os.cpu_count() or 4))
+SERVE_QUEUE = int(os.environ.get("SERVE_QUEUE", 4 * SERVE_WORKERS))
+SERVE_TIMEOUT = float(os.environ.get("SERVE_TIMEOUT", 30))
+SERVE_TRAIN_TIMEOUT = float(os.environ.get("SERVE_TRAIN_TIMEOUT", 900))
+
+
+class ServeBusy(Exception):
+    """Plus de place dans le pool : la requête est refusée (503) plutôt que mise en attente."""
+
+
+class ServeTimeout(Exception):
+    """Le calcul a dépassé le délai de la requête (504)."""
+
+
+class BoundedExecutor:
+    """
+    ThreadPoolExecutor dont la file est bornée : au plus `max_workers` calculs
+    en cours et `max_pending` en attente, au-delà ServeBusy. Les threads sont
+    créés au premier appel dans chaque process (un worker forké a son propre pool).
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._slots = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+                self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+                self._pid = os.getpid()
+            return self._pool, self._slots
+
+    def run(self, fn, *args, timeout: float = None, **kwargs):
+        pool, slots = self._get_pool()
+        if not slots.acquire(blocking=False):
+            raise ServeBusy(self.name)
+        try:
+            future = pool.submit(fn, *args, **kwargs)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # un calcul déjà lancé ne peut pas être interrompu : son résultat est ignoré
+            future.cancel()
+            raise ServeTimeout(f"{self.name}: more than {timeout:g}s")
+
+
+_compute = BoundedExecutor("compute", SERVE_WORKERS, SERVE_QUEUE)
+# un seul entraînement à la fois, sans file d'attente, pour ne pas occuper l'inférence
+_training = BoundedExecutor("train", 1, 0)
+
+
+def configure(async_mode: bool = None):
+    global SERVE_ASYNC
+    if async_mode is not None:
+        SERVE_ASYNC = async_mode
+
+
+def offload(fn, *args, **kwargs):
+    """Inférence / clustering : dans le pool borné en mode asynchrone, sinon appel direct."""
+    if not SERVE_ASYNC:
+        return fn(*args, **kwargs)
+    return _compute.run(fn, *args, timeout=SERVE_TIMEOUT, **kwargs)
+
+
+def offload_training(fn, *args, **kwargs):
+    if not SERVE_ASYNC:
+        return fn(*args, **kwargs)
+    return _training.run(fn, *args, timeout=SERVE_TRAIN_TIMEOUT, **kwargs)
+
+
+def install(app):
+    """Réponses JSON 503 / 504 pour les requêtes refusées ou trop longues."""
+
+    @app.errorhandler(ServeBusy)
+    def _busy(e):
+        return jsonify(error="busy", detail=str(e)), 503
+
+    @app.errorhandler(ServeTimeout)
+    def _timeout(e):
+        return jsonify(error="timeout", detail=str(e)), 504
+
+
+class MicroBatcher:
+    """
+    Regroupe les appels concurrents : le premier élément arrivé ouvre une
+    fenêtre de `max_wait_ms`, les suivants s'y ajoutent jusqu'à `max_items`
+    (mesuré par `size`), puis `run_batch(items)` est appelé une seule fois et
+    chaque appelant reçoit son résultat. Si le lot échoue, chaque élément est
+    rejoué seul : une requête invalide n'entraîne pas les autres avec elle.
+    """
+
+    def __init__(self, run_batch, max_items: int = 256, max_wait_ms: float = 5.0, size=len,
+                 name: str = "batcher"):
+        self.run_batch = run_batch
+        self.max_items = max(1, max_items)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.size = size
+        self.name = name
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def _get_queue(self):
+        with self._lock:
+            if self._queue is None or self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop, args=(self._queue,), name=self.name, daemon=True).start()
+            return self._queue
+
+    def submit(self, item):
+        future = Future()
+        self._get_queue().put((item, future))
+        try:
+            return future.result(timeout=SERVE_TIMEOUT if SERVE_ASYNC else None)
+        except FutureTimeout:
+            future.cancel()
+            raise ServeTimeout(f"{self.name}: more than {SERVE_TIMEOUT:g}s")
+
+    def _loop(self, q):
+        while True:
+            batch = [q.get()]
+            n = self.size(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while n < self.max_items:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(entry)
+                n += self.size(entry[0])
+            # appelants partis (timeout) : on ne calcule pas pour eux
+            batch = [(item, f) for item, f in batch if f.set_running_or_notify_cancel()]
+            if batch:
+                self._run(batch)
+
+    def _run(self, batch):
+        try:
+            results = self.run_batch([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            for entry in batch:
+                self._run([entry])
+            return
+        for (_, f), res in zip(batch, results):
+            f.set_result(res)
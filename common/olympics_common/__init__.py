@@ -0,0 +1 @@
+"""Code partagé entre le service IA (ai/) et l'ingestion PostgreSQL (database/)."""
@@ -0,0 +1,183 @@
+# olympics_common/dataset_cache.py
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow optionnel : on retombe sur pd.read_excel
+    pa = None
+    feather = None
+
+CACHE_SUFFIX = ".arrow"
+META_SUFFIX = ".arrow.json"
+CACHE_VERSION = 1
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_meta(meta_path: str):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path: str, write_fn):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write_fn(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_meta(meta_path: str, meta: dict):
+    def _dump(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    _write_atomic(meta_path, _dump)
+
+
+def cache_paths(xlsx_path: str):
+    """Chemins (cache Arrow, métadonnées) associés à un classeur."""
+    xlsx_path = str(xlsx_path)
+    return xlsx_path + CACHE_SUFFIX, xlsx_path + META_SUFFIX
+
+
+def write_cache(xlsx_path: str, df: pd.DataFrame, sha256: str = None) -> bool:
+    """
+    Écrit `df` comme cache Arrow (Feather v2 non compressé, donc mmap-able)
+    à côté de `xlsx_path`. Retourne False si le cache n'a pas pu être écrit.
+    """
+    if feather is None:
+        return False
+    xlsx_path = str(xlsx_path)
+    cache_path, meta_path = cache_paths(xlsx_path)
+    st = os.stat(xlsx_path)
+    meta = {
+        "version": CACHE_VERSION,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": sha256 or file_sha256(xlsx_path),
+    }
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        _write_atomic(cache_path, lambda tmp: feather.write_feather(table, tmp, compression="uncompressed"))
+        _write_meta(meta_path, meta)
+    except (OSError, pa.ArrowException) as e:
+        print(f"[warn] Cache Arrow non écrit pour {xlsx_path}: {e}")
+        return False
+    return True
+
+
+def write_cache_meta(xlsx_path: str, **info):
+    """
+    Métadonnées d'un cache Arrow écrit à part (ex: generate_dataset.py) :
+    celles du classeur s'il existe, sinon cache marqué `cache_only`.
+    """
+    xlsx_path = str(xlsx_path)
+    _, meta_path = cache_paths(xlsx_path)
+    if os.path.exists(xlsx_path):
+        st = os.stat(xlsx_path)
+        meta = {"version": CACHE_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "sha256": file_sha256(xlsx_path)}
+    else:
+        meta = {"version": CACHE_VERSION, "cache_only": True}
+    _write_meta(meta_path, {**meta, **info})
+
+
+def _cache_only(xlsx_path: str):
+    """
+    Métadonnées d'un cache Arrow sans classeur (jeu généré trop grand pour
+    Excel, cf. generate_dataset.py), None si ce n'est pas le cas.
+    """
+    cache_path, meta_path = cache_paths(xlsx_path)
+    if os.path.exists(xlsx_path) or not os.path.exists(cache_path):
+        return None
+    meta = _read_meta(meta_path)
+    if meta and meta.get("version") == CACHE_VERSION and meta.get("cache_only"):
+        return meta
+    return None
+
+
+def _read_cache(cache_path: str) -> pd.DataFrame:
+    """
+    Lit le cache Arrow avec les valeurs manquantes de pd.read_excel : NaN
+    (et non None) dans les colonnes object, float64 pour une colonne vide.
+    """
+    df = feather.read_table(cache_path, memory_map=True).to_pandas()
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].to_numpy(dtype=object)
+        missing = pd.isna(values)
+        if missing.all():
+            df[col] = np.full(len(values), np.nan)
+        elif missing.any():
+            values = values.copy()
+            values[missing] = np.nan
+            df[col] = values
+    return df
+
+
+def workbook_exists(xlsx_path) -> bool:
+    """Le classeur existe, ou son cache Arrow en tient lieu (jeu généré sans classeur)."""
+    xlsx_path = str(xlsx_path)
+    return os.path.exists(xlsx_path) or _cache_only(xlsx_path) is not None
+
+
+def read_excel_cached(xlsx_path: str) -> pd.DataFrame:
+    """
+    Lit la première feuille d'un classeur Excel via un cache Arrow.
+
+    Le cache est valide tant que taille + mtime du fichier source n'ont pas
+    changé ; sinon on compare le hash SHA-256 du contenu (un simple `touch`
+    ne force pas de reconversion). Les lectures suivantes passent par un
+    memory-map du fichier Arrow au lieu d'openpyxl.
+    Un cache marqué `cache_only` (sans classeur à côté) est lu directement.
+    Lecture à froid (openpyxl) ou à chaud (Arrow) : mêmes colonnes, mêmes
+    types, valeurs manquantes à NaN.
+    """
+    xlsx_path = str(xlsx_path)
+    if feather is None:
+        return pd.read_excel(xlsx_path, engine="openpyxl")
+
+    cache_path, meta_path = cache_paths(xlsx_path)
+    if _cache_only(xlsx_path) is not None:
+        return _read_cache(cache_path)
+    st = os.stat(xlsx_path)
+    meta = _read_meta(meta_path)
+
+    fresh = False
+    sha = None
+    if meta and meta.get("version") == CACHE_VERSION and os.path.exists(cache_path):
+        if meta.get("size") == st.st_size and meta.get("mtime_ns") == st.st_mtime_ns:
+            fresh = True
+        else:
+            sha = file_sha256(xlsx_path)
+            if sha == meta.get("sha256"):
+                fresh = True
+                try:
+                    _write_meta(meta_path, {**meta, "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+                except OSError:
+                    pass
+
+    if fresh:
+        try:
+            return _read_cache(cache_path)
+        except (OSError, pa.ArrowException) as e:
+            print(f"[warn] Cache Arrow illisible ({cache_path}), reconstruction: {e}")
+
+    df = pd.read_excel(xlsx_path, engine="openpyxl")
+    write_cache(xlsx_path, df, sha256=sha)
+    return df
@@ -0,0 +1,197 @@
+"""
+Set-based bulk loading of results / medals.
+
+Instead of resolving every spreadsheet row with several single-row statements
+(ensure_host_exists, get_or_create_athlete, insert_result, insert_medal_if_any),
+the whole normalised frame is COPYed into a temporary staging table and
+hosts, athletes, results and medals are resolved with a handful of
+`INSERT ... SELECT ... ON CONFLICT` statements, in a single transaction.
+
+The staging frame has one row per result with the columns of STAGING_COLUMNS;
+see `medals_frame` in ingest.py / extract_medals_xlsx.py for the builders.
+"""
+
+import io
+import json
+import math
+import pandas as pd
+
+STAGING_COLUMNS = [
+    'row_no', 'name', 'team', 'noc', 'game_slug', 'year', 'season', 'city',
+    'sport', 'event', 'medal', 'medal_type', 'extra',
+]
+
+NULL_STRINGS = ('', 'nan', 'na', 'none')
+
+
+def normalize_medal(medal):
+    """Same mapping as insert_medal_if_any: 'GOLD'/'g' -> 'Gold', unknown -> None."""
+    if not isinstance(medal, str) or medal in ('NA', 'None', ''):
+        return None
+    m = medal.capitalize()
+    if m in ('Gold', 'Silver', 'Bronze'):
+        return m
+    first = m[0].lower()
+    return {'g': 'Gold', 's': 'Silver', 'b': 'Bronze'}.get(first)
+
+
+def clean_text(s: pd.Series) -> pd.Series:
+    """Vectorised normalize_str: trim, collapse inner spaces, NaN / 'nan' / '' -> None."""
+    out = s.astype('string').str.split().str.join(' ')
+    out = out.mask(out.str.lower().isin(NULL_STRINGS))
+    return out.astype(object).where(out.notna(), None)
+
+
+def first_of(df: pd.DataFrame, *cols) -> pd.Series:
+    """Column-wise `row.get(a) or row.get(b) or ...` over the columns that exist."""
+    out = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for c in cols:
+        if c in df.columns:
+            out = out.where(out.notna(), clean_text(df[c]))
+    return out
+
+
+def _json_value(v):
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return None
+    if isinstance(v, str) and v.strip().lower() in NULL_STRINGS[1:]:
+        return None
+    return v
+
+
+def records_json(df: pd.DataFrame) -> pd.Series:
+    """One JSON document per row (NaN / 'na' / 'none' -> null), like the `extra` column."""
+    docs = [
+        json.dumps({k: _json_value(v) for k, v in r.items()}, default=str)
+        for r in df.to_dict(orient='records')
+    ]
+    return pd.Series(docs, index=df.index, dtype=object)
+
+
+def _create_staging(cur):
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS stg_results (
+            row_no INTEGER,
+            name TEXT,
+            team TEXT,
+            noc TEXT,
+            game_slug TEXT,
+            year INTEGER,
+            season TEXT,
+            city TEXT,
+            sport TEXT,
+            event TEXT,
+            medal TEXT,
+            medal_type TEXT,
+            extra JSONB,
+            athlete_id INTEGER
+        ) ON COMMIT DROP
+    """)
+    cur.execute('TRUNCATE stg_results')
+
+
+def copy_frame(cur, table: str, frame: pd.DataFrame, columns):
+    """COPY a DataFrame into `table` (CSV, empty unquoted field = NULL)."""
+    buf = io.StringIO()
+    frame[columns].to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+
+
+def prepare_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Fill in the optional staging columns and drop rows without an athlete name."""
+    frame = frame.copy()
+    for c in STAGING_COLUMNS:
+        if c not in frame.columns:
+            frame[c] = None
+    frame = frame[frame['name'].notna()].reset_index(drop=True)
+    frame['row_no'] = range(len(frame))
+    frame['year'] = pd.to_numeric(frame['year'], errors='coerce').astype('Int64')
+    frame['medal_type'] = frame['medal'].map(normalize_medal)
+    return frame
+
+
+def bulk_load_results(conn, frame: pd.DataFrame, commit: bool = True) -> dict:
+    """
+    Load a staging frame into hosts / athletes / results / medals.
+
+    Semantics follow the row-by-row helpers in db.py:
+    - unknown game slugs get a placeholder host (like ensure_host_exists)
+    - athletes are matched on the athletes_name_team_idx key (lower(name), lower(team))
+    - results upsert on (athlete_id, game_slug, sport, event); the last row wins
+    - one medal per result, only for Gold / Silver / Bronze
+    """
+    frame = prepare_frame(frame)
+    stats = {'rows': len(frame), 'hosts': 0, 'athletes': 0, 'results': 0, 'medals': 0}
+    if frame.empty:
+        return stats
+
+    with conn.cursor() as cur:
+        _create_staging(cur)
+        copy_frame(cur, 'stg_results', frame, STAGING_COLUMNS)
+
+        # 1. hosts: placeholder rows for slugs not in hosts yet
+        cur.execute("""
+            INSERT INTO hosts (game_slug, game_name, game_location, game_season, game_year)
+            SELECT DISTINCT game_slug, initcap(game_slug), 'Unknown', 'Unknown', NULL::INTEGER
+            FROM stg_results
+            WHERE game_slug IS NOT NULL
+            ON CONFLICT (game_slug) DO NOTHING
+        """)
+        stats['hosts'] = cur.rowcount
+
+        # 2. athletes: one insert for every unknown (name, team) key
+        cur.execute("""
+            INSERT INTO athletes (name, team, noc)
+            SELECT DISTINCT ON (lower(name), lower(COALESCE(team, ''))) name, team, noc
+            FROM stg_results
+            ORDER BY lower(name), lower(COALESCE(team, '')), row_no
+            ON CONFLICT ((lower(name)), (lower(COALESCE(team, '')))) DO NOTHING
+        """)
+        stats['athletes'] = cur.rowcount
+
+        cur.execute("""
+            UPDATE stg_results s
+            SET athlete_id = a.id
+            FROM athletes a
+            WHERE lower(a.name) = lower(s.name)
+              AND lower(COALESCE(a.team, '')) = lower(COALESCE(s.team, ''))
+        """)
+
+        # 3 + 4. results (last row wins per unique key) then their medals
+        cur.execute("""
+            WITH src AS (
+                SELECT DISTINCT ON (athlete_id, game_slug, sport, event)
+                       athlete_id, game_slug, year, season, city, sport, event, medal, medal_type, extra
+                FROM stg_results
+                WHERE athlete_id IS NOT NULL
+                ORDER BY athlete_id, game_slug, sport, event, row_no DESC
+            ), ins AS (
+                INSERT INTO results (athlete_id, game_slug, year, season, city, sport, event, medal, extra)
+                SELECT athlete_id, game_slug, year, season, city, sport, event, medal, COALESCE(extra, '{}'::jsonb)
+                FROM src
+                ON CONFLICT (athlete_id, game_slug, sport, event) DO UPDATE SET
+                    medal = EXCLUDED.medal, extra = EXCLUDED.extra
+                RETURNING id, athlete_id, game_slug, sport, event
+            ), med AS (
+                INSERT INTO medals (result_id, athlete_id, game_slug, medal_type)
+                SELECT ins.id, ins.athlete_id, ins.game_slug, src.medal_type
+                FROM ins
+                JOIN src ON src.athlete_id = ins.athlete_id
+                        AND src.game_slug IS NOT DISTINCT FROM ins.game_slug
+                        AND src.sport IS NOT DISTINCT FROM ins.sport
+                        AND src.event IS NOT DISTINCT FROM ins.event
+                WHERE src.medal_type IS NOT NULL AND ins.game_slug IS NOT NULL
+                ON CONFLICT (result_id) DO NOTHING
+                RETURNING id
+            )
+            SELECT (SELECT count(*) FROM ins), (SELECT count(*) FROM med)
+        """)
+        stats['results'], stats['medals'] = cur.fetchone()
+
+    if commit:
+        conn.commit()
+    return stats
@@ -1,8 +1,12 @@
 import os
+import time
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 
 BASE = Path(__file__).resolve().parent.parent
 
@@ -14,16 +18,110 @@ def load_env(env_path: str = None):
         load_dotenv(BASE / '.env')
 
 
+_CONFIG = None
+_POOL = None
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+_LAST_USED = {}
+
+
+def db_config(reload: bool = False) -> dict:
+    """Connection settings from .env / the environment, read once per process."""
+    global _CONFIG
+    if _CONFIG is None or reload:
+        load_env()
+        config = {
+            'host': os.getenv('DB_HOST'),
+            'port': os.getenv('DB_PORT'),
+            'dbname': os.getenv('DB_NAME'),
+            'user': os.getenv('DB_USER'),
+            'password': os.getenv('DB_PASSWORD'),
+        }
+        if not all(config.values()):
+            raise RuntimeError('DB configuration incomplete in .env')
+        _CONFIG = config
+    return _CONFIG
+
+
 def get_conn():
-    load_env()
-    host = os.getenv('DB_HOST')
-    port = os.getenv('DB_PORT')
-    db = os.getenv('DB_NAME')
-    user = os.getenv('DB_USER')
-    pwd = os.getenv('DB_PASSWORD')
-    if not all([host, port, db, user, pwd]):
-        raise RuntimeError('DB configuration incomplete in .env')
-    return psycopg2.connect(host=host, port=port, dbname=db, user=user, password=pwd)
+    """A new dedicated connection (the caller closes it). Prefer `connection()`."""
+    return psycopg2.connect(**db_config())
+
+
+def get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """
+    Process-wide connection pool, created on first use. Sizes come from
+    DB_POOL_MIN (default 1) and DB_POOL_MAX (default 10). A forked child
+    gets its own pool: connections are never shared across processes.
+    """
+    global _POOL, _POOL_PID
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != os.getpid():
+            _POOL = psycopg2.pool.ThreadedConnectionPool(
+                int(os.getenv('DB_POOL_MIN', 1)), int(os.getenv('DB_POOL_MAX', 10)), **db_config()
+            )
+            _POOL_PID = os.getpid()
+            _LAST_USED.clear()
+        return _POOL
+
+
+def close_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL_PID == os.getpid():
+            _POOL.closeall()
+        _POOL = None
+        _LAST_USED.clear()
+
+
+def _healthy(conn) -> bool:
+    if conn.closed or conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    # round trip only for connections idle long enough to have been dropped by the server
+    if time.monotonic() - _LAST_USED.get(id(conn), 0) < float(os.getenv('DB_POOL_PING_AFTER', 30)):
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextmanager
+def connection():
+    """
+    Pooled connection, checked on checkout and given back on exit:
+
+        with connection() as conn:
+            ingest_medals(conn, path)
+
+    An exception rolls back the open transaction; whatever is left
+    uncommitted at exit is rolled back too, so the pool never hands out a
+    connection in the middle of a transaction.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    for _ in range(pool.maxconn):
+        if _healthy(conn):
+            break
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except Exception:
+        broken = conn.closed != 0
+        if not broken:
+            conn.rollback()
+        raise
+    finally:
+        if not broken and not conn.closed:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            _LAST_USED[id(conn)] = time.monotonic()
+        pool.putconn(conn, close=broken or bool(conn.closed))
 
 
 def create_tables_from_sql(conn, sql_path: Path):
@@ -34,7 +132,7 @@ def create_tables_from_sql(conn, sql_path: Path):
     conn.commit()
 
 
-def insert_host(conn, host):
+def insert_host(conn, host, commit: bool = True):
     sql = (
         "INSERT INTO hosts (game_slug, game_name, game_location, game_season, game_year, game_start_date, game_end_date) "
         "VALUES (%(game_slug)s, %(game_name)s, %(game_location)s, %(game_season)s, %(game_year)s, %(game_start_date)s, %(game_end_date)s) "
@@ -48,10 +146,11 @@ def insert_host(conn, host):
     )
     with conn.cursor() as cur:
         cur.execute(sql, host)
-    conn.commit()
+    if commit:
+        conn.commit()
 
 
-def ensure_host_exists(conn, game_slug):
+def ensure_host_exists(conn, game_slug, commit: bool = True):
     """
     Vérifie que le host existe dans la table hosts, sinon le crée.
     Permet d’éviter une erreur FOREIGN KEY lors de l’insertion dans results.
@@ -67,20 +166,42 @@ def ensure_host_exists(conn, game_slug):
                 VALUES (%s, %s, %s, %s, %s)
                 ON CONFLICT (game_slug) DO NOTHING
             """, (game_slug, game_slug.title(), 'Unknown', 'Unknown', None))
-    conn.commit()
+    if commit:
+        conn.commit()
+
+
+def ensure_hosts_exist(conn, game_slugs, commit: bool = True):
+    """Set version of ensure_host_exists: one INSERT for all the placeholder hosts missing."""
+    rows = [(slug, slug.title(), 'Unknown', 'Unknown', None) for slug in sorted({s for s in game_slugs if s})]
+    if rows:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO hosts (game_slug, game_name, game_location, game_season, game_year)
+                VALUES %s
+                ON CONFLICT (game_slug) DO NOTHING
+            """, rows)
+    if commit:
+        conn.commit()
+    return len(rows)
 
 
-def get_or_create_athlete(conn, athlete):
+def normalize_athlete(athlete):
+    """(name, team) trimmed with inner spaces collapsed, as stored by get_or_create_athlete."""
+    name = athlete.get('name')
+    if not name:
+        raise ValueError('Athlete name is required to insert into athletes table')
+    name = ' '.join(str(name).split())
+    team = athlete.get('team')
+    team = ' '.join(str(team).split()) if team else None
+    return name, team
+
+
+def get_or_create_athlete(conn, athlete, commit: bool = True):
     """Insert athlete if not exists. athlete is dict containing ref_id (optional), name, sex, age, height, weight, team, noc"""
     with conn.cursor() as cur:
         # Ensure we have a non-empty name (DB enforces NOT NULL)
-        name = athlete.get('name')
-        if not name:
-            raise ValueError('Athlete name is required to insert into athletes table')
         # normalize name and team (trim, collapse spaces)
-        name = ' '.join(str(name).split())
-        team = athlete.get('team')
-        team = ' '.join(str(team).split()) if team else None
+        name, team = normalize_athlete(athlete)
 
         # Try matching by ref_id first
         if athlete.get('ref_id'):
@@ -110,13 +231,255 @@ def get_or_create_athlete(conn, athlete):
             ),
         )
         new_id = cur.fetchone()[0]
-    conn.commit()
+    if commit:
+        conn.commit()
     return new_id
 
 
-def insert_result(conn, result):
+class AthleteResolver:
+    """
+    In-memory identity map for athletes, loaded once per ingest run.
+
+    Mirrors get_or_create_athlete (match by ref_id, then by lower(name) +
+    lower(team)) without any SELECT per row: the existing mappings are read
+    once, unknown athletes are inserted in batches with RETURNING, and the
+    unique index athletes_name_team_idx settles any race with another writer.
+    """
+
+    INSERT_SQL = (
+        'INSERT INTO athletes (ref_id, name, sex, age, height, weight, team, noc) VALUES %s '
+        "ON CONFLICT ((lower(name)), (lower(COALESCE(team, '')))) DO UPDATE SET name = athletes.name "
+        'RETURNING id'
+    )
+
+    PROFILE_SQL = (
+        'INSERT INTO athletes (name, age, team, noc, profile_url, bio, games_participations) VALUES %s '
+        "ON CONFLICT ((lower(name)), (lower(COALESCE(team, '')))) DO UPDATE SET "
+        'profile_url = EXCLUDED.profile_url, bio = EXCLUDED.bio, '
+        'games_participations = EXCLUDED.games_participations '
+        'RETURNING id'
+    )
+
+    def __init__(self, conn, batch_size: int = 1000):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.by_key = {}
+        self.by_ref = {}
+        self.inserted = 0
+        # keys mapped since the last commit, so a rolled-back savepoint can be undone
+        self._journal = []
+        self._load()
+
+    @staticmethod
+    def key(name, team):
+        return name.lower(), (team or '').lower()
+
+    def _load(self):
+        # named (server-side) cursor: the table is streamed, not fetched at once
+        with self.conn.cursor(name='athlete_resolver_preload') as cur:
+            cur.itersize = 50000
+            cur.execute("SELECT id, ref_id, lower(name), lower(COALESCE(team, '')) FROM athletes")
+            for aid, ref_id, lname, lteam in cur:
+                self.by_key[(lname, lteam)] = aid
+                if ref_id is not None:
+                    self.by_ref[ref_id] = aid
+
+    def lookup(self, athlete):
+        if athlete.get('ref_id') and athlete['ref_id'] in self.by_ref:
+            return self.by_ref[athlete['ref_id']]
+        name, team = normalize_athlete(athlete)
+        return self.by_key.get(self.key(name, team))
+
+    def resolve_many(self, athletes, commit: bool = True):
+        """
+        Ids for a list of athlete dicts (same order). Unknown athletes are
+        inserted `batch_size` at a time; invalid ones (no name) give None.
+        """
+        ids = [None] * len(athletes)
+        pending = {}
+        for i, athlete in enumerate(athletes):
+            try:
+                aid = self.lookup(athlete)
+            except ValueError:
+                continue
+            if aid is not None:
+                ids[i] = aid
+                continue
+            name, team = normalize_athlete(athlete)
+            pending.setdefault(self.key(name, team), (athlete, name, team, []))[3].append(i)
+
+        # sorted keys: concurrent writers take the index locks in the same order (no deadlock)
+        items = sorted(pending.items(), key=lambda kv: kv[0])
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            rows = [
+                (a.get('ref_id'), name, a.get('sex'), a.get('age'), a.get('height'),
+                 a.get('weight'), team, a.get('noc'))
+                for _, (a, name, team, _) in chunk
+            ]
+            with self.conn.cursor() as cur:
+                returned = psycopg2.extras.execute_values(cur, self.INSERT_SQL, rows, page_size=len(rows), fetch=True)
+            for (key, (a, _, _, positions)), (aid,) in zip(chunk, returned):
+                self.by_key[key] = aid
+                if a.get('ref_id'):
+                    self.by_ref[a['ref_id']] = aid
+                self._journal.append((key, a.get('ref_id')))
+                for i in positions:
+                    ids[i] = aid
+            self.inserted += len(chunk)
+        if items and commit:
+            self.conn.commit()
+            self.clear_journal()
+        return ids
+
+    def upsert_profiles(self, athletes, commit: bool = True):
+        """
+        Athletes with their profile fields (profile_url, bio, games_participations)
+        in one INSERT ... ON CONFLICT DO UPDATE per batch: new athletes are created,
+        known ones only get their profile updated. Returns the ids (same order,
+        None for invalid entries); duplicates in the input: the last one wins.
+        """
+        ids = [None] * len(athletes)
+        pending = {}
+        for i, athlete in enumerate(athletes):
+            try:
+                name, team = normalize_athlete(athlete)
+            except ValueError:
+                continue
+            key = self.key(name, team)
+            positions = pending.pop(key, (None, None, None, []))[3]
+            positions.append(i)
+            pending[key] = (athlete, name, team, positions)
+
+        items = sorted(pending.items(), key=lambda kv: kv[0])
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            rows = [
+                (name, a.get('age'), team, a.get('noc'), a.get('profile_url'), a.get('bio'),
+                 a.get('games_participations'))
+                for _, (a, name, team, _) in chunk
+            ]
+            with self.conn.cursor() as cur:
+                returned = psycopg2.extras.execute_values(cur, self.PROFILE_SQL, rows, page_size=len(rows), fetch=True)
+            for (key, (_, _, _, positions)), (aid,) in zip(chunk, returned):
+                if key not in self.by_key:
+                    self.inserted += 1
+                    self._journal.append((key, None))
+                self.by_key[key] = aid
+                for i in positions:
+                    ids[i] = aid
+        if items and commit:
+            self.conn.commit()
+            self.clear_journal()
+        return ids
+
+    def journal_mark(self) -> int:
+        return len(self._journal)
+
+    def forget_since(self, mark: int):
+        """Drop the ids mapped after `mark` (their INSERT was rolled back)."""
+        for key, ref_id in self._journal[mark:]:
+            self.by_key.pop(key, None)
+            if ref_id:
+                self.by_ref.pop(ref_id, None)
+        del self._journal[mark:]
+
+    def clear_journal(self):
+        """Everything mapped so far is committed."""
+        self._journal.clear()
+
+    def get_or_create(self, athlete, commit: bool = True):
+        """Drop-in replacement for get_or_create_athlete(conn, athlete)."""
+        aid = self.lookup(athlete)
+        if aid is not None:
+            return aid
+        return self.resolve_many([athlete], commit=commit)[0]
+
+
+class BatchCommitter:
+    """
+    Commits every `commit_every` rows instead of after every statement.
+
+    Each row runs inside a SAVEPOINT: a failing row is rolled back on its own
+    (and counted as failed) while the rows before it in the batch are kept.
+
+        batch = BatchCommitter(conn, commit_every=500, resolver=resolver)
+        for rec in records:
+            with batch.row(rec.get('name')):
+                if not valid(rec):
+                    batch.skip()
+                    continue
+                insert_result(conn, ..., commit=False)
+        batch.commit()
+        print(batch.summary())
+    """
+
+    def __init__(self, conn, commit_every: int = 1, resolver: AthleteResolver = None):
+        self.conn = conn
+        self.commit_every = max(1, int(commit_every))
+        self.resolver = resolver
+        self.pending = 0
+        self.committed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.last_error = None
+        self._skip = False
+
+    @contextmanager
+    def row(self, label=None, count_failure: bool = True):
+        """
+        One row in its own SAVEPOINT. On error the row is rolled back and
+        the exception kept in `last_error`; with count_failure=False the
+        caller decides (e.g. retries smaller parts) and calls record_failure itself.
+        """
+        self._skip = False
+        self.last_error = None
+        mark = self.resolver.journal_mark() if self.resolver else 0
+        with self.conn.cursor() as cur:
+            cur.execute('SAVEPOINT ingest_row')
+        try:
+            yield self
+        except Exception as e:
+            with self.conn.cursor() as cur:
+                cur.execute('ROLLBACK TO SAVEPOINT ingest_row')
+            if self.resolver:
+                self.resolver.forget_since(mark)
+            self.last_error = e
+            if count_failure:
+                self.record_failure(label, e)
+            return
+        with self.conn.cursor() as cur:
+            cur.execute('RELEASE SAVEPOINT ingest_row')
+        if self._skip:
+            self.skipped += 1
+            return
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def record_failure(self, label, error):
+        """Count a rolled-back row as failed."""
+        self.failed += 1
+        print(f'Row {label!r} rolled back: {error}')
+
+    def skip(self):
+        """Mark the current row as skipped (nothing to commit for it)."""
+        self._skip = True
+
+    def commit(self):
+        self.conn.commit()
+        self.committed += self.pending
+        self.pending = 0
+        if self.resolver:
+            self.resolver.clear_journal()
+
+    def summary(self) -> str:
+        return f'committed={self.committed}, skipped={self.skipped}, failed={self.failed}'
+
+
+def insert_result(conn, result, commit: bool = True):
     # Vérifie que le host correspondant existe avant insertion
-    ensure_host_exists(conn, result['game_slug'])
+    ensure_host_exists(conn, result['game_slug'], commit=commit)
 
     sql = (
         'INSERT INTO results (athlete_id, game_slug, year, season, city, sport, event, medal, extra) '
@@ -138,11 +501,12 @@ def insert_result(conn, result):
             psycopg2.extras.Json(result.get('extra') or {})
         ))
         rid = cur.fetchone()[0]
-    conn.commit()
+    if commit:
+        conn.commit()
     return rid
 
 
-def insert_medal_if_any(conn, result_id, athlete_id, game_slug, medal):
+def insert_medal_if_any(conn, result_id, athlete_id, game_slug, medal, commit: bool = True):
     if not medal or medal in ('NA', 'None', ''):
         return None
 
@@ -159,7 +523,7 @@ def insert_medal_if_any(conn, result_id, athlete_id, game_slug, medal):
             return None
 
     # Vérifie aussi que le host existe avant insertion de la médaille
-    ensure_host_exists(conn, game_slug)
+    ensure_host_exists(conn, game_slug, commit=commit)
 
     with conn.cursor() as cur:
         cur.execute('SELECT id FROM medals WHERE result_id = %s', (result_id,))
@@ -170,5 +534,6 @@ def insert_medal_if_any(conn, result_id, athlete_id, game_slug, medal):
             (result_id, athlete_id, game_slug, m)
         )
         mid = cur.fetchone()[0]
-    conn.commit()
+    if commit:
+        conn.commit()
     return mid
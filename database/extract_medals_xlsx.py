@@ -2,7 +2,7 @@
 """Extract medals from dataset/olympic_medals.xlsx and populate the `medals` table.
 
 Usage:
-    python extract_medals_xlsx.py
+    python extract_medals_xlsx.py [--bulk] [--commit-every N]
 
 This script will:
 - read the Excel file `dataset/olympic_medals.xlsx` (first sheet)
@@ -10,14 +10,23 @@ This script will:
 - insert or update a corresponding `results` row with sport/event/medal and store the original row in `extra`
 - insert a `medals` row when appropriate (avoids duplicates)
 
+With --bulk the whole sheet is COPYed into a staging table and resolved with
+a few set-based statements (see bulk.py) instead of row by row.
+In row mode, --commit-every N commits every N rows; each row still runs in
+its own savepoint, so a bad row is rolled back alone.
+
 Run this after a DB backup. The script is conservative and idempotent.
 """
 
 import sys
+import json
+import argparse
 from pathlib import Path
 import pandas as pd
 
-from db import get_conn, get_or_create_athlete, insert_result, insert_medal_if_any, ensure_host_exists
+from db import connection, AthleteResolver, BatchCommitter, insert_result, insert_medal_if_any
+from olympics_common.dataset_cache import read_excel_cached, workbook_exists
+from bulk import bulk_load_results, clean_text, first_of
 
 
 BASE = Path(__file__).resolve().parent.parent
@@ -25,10 +34,10 @@ XLSX = BASE / 'dataset' / 'olympic_medals.xlsx'
 
 
 def read_sheet(path: Path):
-    if not path.exists():
+    if not workbook_exists(path):
         raise FileNotFoundError(f"Excel file not found: {path}")
-    # pandas will use openpyxl for .xlsx
-    df = pd.read_excel(path, engine='openpyxl')
+    # openpyxl on first read, then a memory-mapped Arrow cache next to the .xlsx
+    df = read_excel_cached(path)
     return df
 
 
@@ -39,112 +48,152 @@ def normalize_str(v):
     return s if s != '' else None
 
 
-def main():
+def medals_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Vectorised version of the row mapping in main(), for bulk mode."""
+    cols = ['discipline_title', 'slug_game', 'event_title', 'event_gender', 'medal_type',
+            'participant_type', 'participant_title', 'athlete_url', 'athlete_full_name',
+            'country_name', 'country_code', 'country_3_letter_code']
+    clean = pd.DataFrame({c: clean_text(df[c]) if c in df.columns else None for c in cols}, index=df.index)
+
+    # Skip rows with no athlete name and no participant title
+    clean = clean[clean['athlete_full_name'].notna() | clean['participant_title'].notna()]
+
+    is_team = clean['participant_type'].fillna('').str.upper().str.contains('TEAM')
+    team_name = first_of(clean, 'participant_title', 'country_name')
+    name = team_name.where(is_team, clean['athlete_full_name'])
+    team = team_name.where(is_team, clean['country_name'])
+
+    extra_cols = ['participant_type', 'participant_title', 'athlete_url', 'athlete_full_name',
+                  'country_name', 'country_code', 'country_3_letter_code', 'event_gender']
+    extra = [json.dumps(r) for r in clean[extra_cols].to_dict(orient='records')]
+
+    return pd.DataFrame({
+        'name': name,
+        'team': team,
+        'noc': first_of(clean, 'country_code', 'country_3_letter_code'),
+        'game_slug': clean['slug_game'],
+        'sport': clean['discipline_title'],
+        'event': clean['event_title'],
+        'medal': clean['medal_type'],
+        'extra': pd.Series(extra, index=clean.index, dtype=object),
+    })
+
+
+def main_bulk():
     df = read_sheet(XLSX)
     print(f"Read {len(df)} rows from {XLSX.name}")
 
-    conn = get_conn()
-    inserted_medals = 0
-    inserted_results = 0
-    inserted_athletes = 0
-
-    for idx, row in df.iterrows():
-        # Map columns (expected names from the spreadsheet)
-        discipline = normalize_str(row.get('discipline_title'))
-        slug_game = normalize_str(row.get('slug_game'))
-        event_title = normalize_str(row.get('event_title'))
-        event_gender = normalize_str(row.get('event_gender'))
-        medal_type = normalize_str(row.get('medal_type'))
-        participant_type = normalize_str(row.get('participant_type'))
-        participant_title = normalize_str(row.get('participant_title'))
-        athlete_url = normalize_str(row.get('athlete_url'))
-        athlete_full_name = normalize_str(row.get('athlete_full_name'))
-        country_name = normalize_str(row.get('country_name'))
-        country_code = normalize_str(row.get('country_code'))
-        country_3 = normalize_str(row.get('country_3_letter_code'))
-
-        # Skip rows with no athlete name and no participant title
-        if not athlete_full_name and not participant_title:
-            # nothing to insert as athlete
-            continue
-
-        # Build athlete dict. Do NOT store the URL in `ref_id` because
-        # `athletes.ref_id` is an INTEGER in the schema. Keep URL in extra instead.
-        # Déterminer si c'est une équipe ou un individu
-        is_team = participant_type and 'TEAM' in participant_type.upper()
+    with connection() as conn:
+        stats = bulk_load_results(conn, medals_frame(df))
+    print(f"Inserted/updated results: {stats['results']}, inserted medals: {stats['medals']} ({stats})")
+
+
+def main(commit_every: int = 1):
+    df = read_sheet(XLSX)
+    print(f"Read {len(df)} rows from {XLSX.name}")
+
+    with connection() as conn:
+        resolver = AthleteResolver(conn)
+        inserted_medals = 0
+        inserted_results = 0
+        pending = []
+
+        for idx, row in df.iterrows():
+            # Map columns (expected names from the spreadsheet)
+            discipline = normalize_str(row.get('discipline_title'))
+            slug_game = normalize_str(row.get('slug_game'))
+            event_title = normalize_str(row.get('event_title'))
+            event_gender = normalize_str(row.get('event_gender'))
+            medal_type = normalize_str(row.get('medal_type'))
+            participant_type = normalize_str(row.get('participant_type'))
+            participant_title = normalize_str(row.get('participant_title'))
+            athlete_url = normalize_str(row.get('athlete_url'))
+            athlete_full_name = normalize_str(row.get('athlete_full_name'))
+            country_name = normalize_str(row.get('country_name'))
+            country_code = normalize_str(row.get('country_code'))
+            country_3 = normalize_str(row.get('country_3_letter_code'))
+
+            # Skip rows with no athlete name and no participant title
+            if not athlete_full_name and not participant_title:
+                # nothing to insert as athlete
+                continue
+
+            # Build athlete dict. Do NOT store the URL in `ref_id` because
+            # `athletes.ref_id` is an INTEGER in the schema. Keep URL in extra instead.
+            # Déterminer si c'est une équipe ou un individu
+            is_team = participant_type and 'TEAM' in participant_type.upper()
         
-        if is_team:
-            # Enregistrement d'une équipe (ex: "United States team")
-            athlete = {
-                'name': participant_title or country_name,
-                'team': participant_title or country_name,
-                'noc': country_code or country_3,
-                'ref_id': None,
+            if is_team:
+                # Enregistrement d'une équipe (ex: "United States team")
+                athlete = {
+                    'name': participant_title or country_name,
+                    'team': participant_title or country_name,
+                    'noc': country_code or country_3,
+                    'ref_id': None,
+                }
+            else:
+                # Enregistrement d'un individu (ex: "Elaine THOMPSON-HERAH")
+                athlete = {
+                    'name': athlete_full_name,
+                    'team': country_name,  # ou None si tu veux éviter tout mélange
+                    'noc': country_code or country_3,
+                    'ref_id': None,
+                }
+
+
+            # prepare result dict for insert_result (athlete_id resolved below)
+            result = {
+                'athlete_id': None,
+                'game_slug': slug_game,
+                'year': None,
+                'season': None,
+                'city': None,
+                'sport': discipline,
+                'event': event_title,
+                'medal': medal_type,
+                'extra': {
+                    'participant_type': participant_type,
+                    'participant_title': participant_title,
+                    'athlete_url': athlete_url,
+                    'athlete_full_name': athlete_full_name,
+                    'country_name': country_name,
+                    'country_code': country_code,
+                    'country_3_letter_code': country_3,
+                    'event_gender': event_gender,
+                }
             }
-        else:
-            # Enregistrement d'un individu (ex: "Elaine THOMPSON-HERAH")
-            athlete = {
-                'name': athlete_full_name,
-                'team': country_name,  # ou None si tu veux éviter tout mélange
-                'noc': country_code or country_3,
-                'ref_id': None,
-            }
-        
+            pending.append((idx, athlete, result))
 
-        # ensure host exists (guard against unexpected errors)
-        if slug_game:
-            try:
-                ensure_host_exists(conn, slug_game)
-            except Exception as e:
-                print(f"Warning: ensure_host_exists failed for slug '{slug_game}': {e}")
-                # continue — we can still insert results without a host row
-
-        try:
-            aid = get_or_create_athlete(conn, athlete)
-        except Exception as e:
-            print(f"Skipping row {idx}: failed to get/create athlete: {e}")
-            continue
-
-        # prepare result dict for insert_result
-        result = {
-            'athlete_id': aid,
-            'game_slug': slug_game,
-            'year': None,
-            'season': None,
-            'city': None,
-            'sport': discipline,
-            'event': event_title,
-            'medal': medal_type,
-            'extra': {
-                'participant_type': participant_type,
-                'participant_title': participant_title,
-                'athlete_url': athlete_url,
-                'athlete_full_name': athlete_full_name,
-                'country_name': country_name,
-                'country_code': country_code,
-                'country_3_letter_code': country_3,
-                'event_gender': event_gender,
-            }
-        }
+        # Resolve every athlete at once: in-memory lookups, batched inserts for new ones
+        batch = BatchCommitter(conn, commit_every, resolver=resolver)
+        athlete_ids = resolver.resolve_many([athlete for _, athlete, _ in pending], commit=False)
 
-        try:
-            rid = insert_result(conn, result)
-            inserted_results += 1
-        except Exception as e:
-            print(f"Failed to insert result for row {idx}: {e}")
-            continue
+        for (idx, athlete, result), aid in zip(pending, athlete_ids):
+            if aid is None:
+                print(f"Skipping row {idx}: failed to get/create athlete {athlete.get('name')!r}")
+                continue
+            result['athlete_id'] = aid
 
-        try:
-            mid = insert_medal_if_any(conn, rid, aid, slug_game, medal_type)
-            if mid:
-                inserted_medals += 1
-        except Exception as e:
-            print(f"Failed to insert medal for row {idx}: {e}")
-            continue
+            # one savepoint per row: a failing insert only rolls back this row
+            with batch.row(f"row {idx}"):
+                # insert_result also creates a placeholder host for unknown slugs
+                rid = insert_result(conn, result, commit=False)
+                mid = insert_medal_if_any(conn, rid, aid, result['game_slug'], result['medal'], commit=False)
+                inserted_results += 1
+                inserted_medals += 1 if mid else 0
+        batch.commit()
 
-    conn.close()
-    print(f"Inserted/updated results: {inserted_results}, inserted medals: {inserted_medals}")
+        print(f"Inserted/updated results: {inserted_results}, inserted medals: {inserted_medals}, "
+              f"new athletes: {resolver.inserted} ({batch.summary()})")
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bulk', action='store_true', help='set-based load through a staging table')
+    parser.add_argument('--commit-every', type=int, default=1, metavar='N',
+                        help='row mode: commit every N rows')
+    args = parser.parse_args()
+    if args.bulk:
+        main_bulk()
+    else:
+        main(commit_every=args.commit_every)
@@ -1,17 +1,26 @@
 from pathlib import Path
 import json
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
+from lxml import etree
 from db import (
-    get_conn,
+    connection,
+    normalize_athlete,
+    ensure_hosts_exist,
     create_tables_from_sql,
     insert_host,
-    get_or_create_athlete,
+    AthleteResolver,
+    BatchCommitter,
     insert_result,
     insert_medal_if_any,
-    ensure_host_exists
+    ensure_host_exists,
 )
+from olympics_common.dataset_cache import read_excel_cached, workbook_exists
+from bulk import bulk_load_results, first_of, clean_text, records_json
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import multiprocessing
+import zlib
 import pandas as pd
 import re
 
@@ -81,121 +90,186 @@ def ingest_hosts(conn, path: Path):
             insert_host(conn, host)
 
 
-# --- NEW: Clean ingestion of athlete metadata JSON ---
-def ingest_athletes_json(conn, path: Path):
-    print('Ingesting base athlete data from', path)
-    text = path.read_text(encoding='utf-8')
-    try:
-        data = json.loads(text)
-    except Exception as e:
-        print('Error parsing JSON:', e)
-        return
+def iter_json_array(path: Path, chunk_size: int = 1 << 20):
+    """
+    Yields the elements of a top-level JSON array one at a time, reading the
+    file by chunks (json.JSONDecoder.raw_decode), so memory depends on the
+    size of one element, not of the file. ValueError if it is not an array.
+    """
+    decoder = json.JSONDecoder()
+    started = False
+    buf, pos = '', 0
+    with open(path, 'r', encoding='utf-8') as fh:
+        while True:
+            chunk = fh.read(chunk_size)
+            buf, pos = buf[pos:] + chunk, 0
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos == len(buf):
+                    break
+                if not started:
+                    if buf[pos] != '[':
+                        raise ValueError('expected a JSON array')
+                    started, pos = True, pos + 1
+                    continue
+                if buf[pos] == ']':
+                    return
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if not chunk:
+                        raise
+                    break  # élément coupé par la fin du bloc : on relit plus loin
+                # un nombre (ou true/false/null) n'est complet qu'une fois suivi d'un
+                # séparateur : '1.' + '5' ou '12' + '3' coupés par la fin du bloc
+                scalar = buf[pos] not in '{["'
+                if chunk and (end == len(buf) or (scalar and buf[end] not in ' \t\r\n,]')):
+                    break
+                yield obj
+                pos = end
+            if not chunk:
+                raise ValueError('truncated JSON array')
+
+
+def athlete_profile(rec):
+    """Athlete dict (with profile fields) for one olympic_athletes.json record, None if unusable."""
+    name = rec.get('athlete_full_name') if isinstance(rec, dict) else None
+    if not name or len(name.strip()) < 2:
+        return None
+
+    birth_year = rec.get('athlete_year_birth')
+    age = None
+    if birth_year:
+        try:
+            age = datetime.now().year - int(birth_year)
+        except Exception:
+            pass
+
+    first_game = rec.get('first_game')
+    game_slug = None
+    if first_game:
+        parts = first_game.strip().split()
+        if len(parts) == 2:
+            city, year = parts
+            game_slug = f"{city.lower()}-{year}"
+
+    return {
+        'ref_id': None,
+        'name': name.strip(),
+        'sex': None,
+        'age': age,
+        'height': None,
+        'weight': None,
+        'team': None,
+        'noc': None,
+        'profile_url': rec.get('athlete_url'),
+        'bio': rec.get('bio'),
+        'games_participations': safe_int(rec.get('games_participations')),
+        'first_game_slug': game_slug,
+    }
 
-    if not isinstance(data, list):
-        print('Invalid JSON structure: expected list of athletes')
-        return
 
+# --- NEW: Clean ingestion of athlete metadata JSON ---
+def ingest_athletes_json(conn, path: Path, resolver: AthleteResolver = None, commit_every: int = 1):
+    """
+    Streams the file (iter_json_array) and upserts athletes + profile fields
+    by batches of resolver.batch_size, one statement per batch. `commit_every`
+    counts batches; each batch runs in its own savepoint.
+    """
+    print('Ingesting base athlete data from', path)
+    resolver = resolver or AthleteResolver(conn)
+    batch = BatchCommitter(conn, commit_every, resolver=resolver)
+    seen_slugs = set()
     total = 0
-    inserted = 0
     skipped = 0
+    upserted = 0
+
+    def flush(profiles):
+        nonlocal upserted
+        with batch.row(f'athletes {total - len(profiles) + 1}..{total}'):
+            for slug in {p['first_game_slug'] for p in profiles} - seen_slugs - {None}:
+                ensure_host_exists(conn, slug, commit=False)
+            ids = resolver.upsert_profiles(profiles, commit=False)
+            upserted += sum(aid is not None for aid in ids)
+            seen_slugs.update(p['first_game_slug'] for p in profiles)
+
+    profiles = []
+    try:
+        for rec in iter_json_array(path):
+            total += 1
+            profile = athlete_profile(rec)
+            if profile is None:
+                skipped += 1
+                continue
+            profiles.append(profile)
+            if len(profiles) >= resolver.batch_size:
+                flush(profiles)
+                profiles = []
+    except ValueError as e:
+        # JSONDecodeError est aussi une ValueError
+        print('Error parsing JSON:', e)
+    if profiles:
+        flush(profiles)
+    batch.commit()
 
-    for rec in data:
-        total += 1
-        name = rec.get('athlete_full_name')
-        if not name or len(name.strip()) < 2:
-            skipped += 1
-            continue
-
-        birth_year = rec.get('athlete_year_birth')
-        age = None
-        if birth_year:
-            try:
-                age = datetime.now().year - int(birth_year)
-            except Exception:
-                pass
-
-        first_game = rec.get('first_game')
-        game_slug = None
-        if first_game:
-            parts = first_game.strip().split()
-            if len(parts) == 2:
-                city, year = parts
-                game_slug = f"{city.lower()}-{year}"
-                try:
-                    ensure_host_exists(conn, game_slug)
-                except Exception:
-                    pass
-
-        athlete = {
-            'ref_id': None,
-            'name': name.strip(),
-            'sex': None,
-            'age': age,
-            'height': None,
-            'weight': None,
-            'team': None,
-            'noc': None,
-        }
+    print(f"JSON athletes ingestion complete: total={total}, upserted={upserted}, skipped={skipped} "
+          f"(batches: {batch.summary()})")
 
-        try:
-            athlete_id = get_or_create_athlete(conn, athlete)
-            inserted += 1
-        except Exception as e:
-            skipped += 1
-            print(f"Skipping athlete {name} due to error: {e}")
-            continue
 
-        # Mise à jour des infos additionnelles
-        with conn.cursor() as cur:
-            cur.execute("""
-                UPDATE athletes
-                SET profile_url = %s,
-                    bio = %s,
-                    games_participations = %s
-                WHERE id = %s
-            """, (
-                rec.get('athlete_url'),
-                rec.get('bio'),
-                rec.get('games_participations'),
-                athlete_id
-            ))
-        conn.commit()
-
-    print(f"JSON athletes ingestion complete: total={total}, inserted={inserted}, skipped={skipped}")
+def _cell_text(el) -> str:
+    # équivalent de BeautifulSoup get_text(strip=True)
+    if len(el) == 0:
+        return (el.text or '').strip()
+    return ''.join(t.strip() for t in el.itertext())
 
 
-# --- Ingest results HTML (standardized columns) ---
-def ingest_results_html(conn, path: Path):
-    print('Ingesting results HTML from', path)
-    html = path.read_text(encoding='utf-8')
-    soup = BeautifulSoup(html, 'html.parser')
-    table = soup.find('table')
-    if not table:
-        print('No table found in HTML')
-        return
+def iter_html_rows(path: Path):
+    """
+    Yields the rows of the first <table> of an HTML file as dicts {header: cell},
+    without building the whole tree: lxml parses the file incrementally and
+    every <tr> is freed once read, so memory stays flat whatever the file size.
+    Headers are the <th> cells; rows whose cell count differs are ignored.
+    """
+    headers = None
+    with open(path, 'rb') as fh:
+        parser = etree.iterparse(fh, events=('end',), tag=('tr', 'table'), html=True, encoding='utf-8')
+        for _, el in parser:
+            if el.tag == 'table':
+                return
+            if headers is None:
+                ths = el.findall('th')
+                if ths:
+                    headers = [_cell_text(th) for th in ths]
+            else:
+                cells = [_cell_text(td) for td in el.findall('td')]
+                if cells and len(cells) == len(headers):
+                    yield dict(zip(headers, cells))
+            # libère la ligne et celles déjà lues
+            el.clear(keep_tail=True)
+            parent = el.getparent()
+            while el.getprevious() is not None:
+                del parent[0]
+
+
+INVALID_NAME_PATTERN = re.compile(
+    r'(?i)\b(men|women|mixed|relay|team|aerial|freestyle|cross|mogul|pipe|slopestyle|snowboard|ski|event)\b'
+)
 
-    headers = [th.get_text(strip=True) for th in table.find_all('th')]
-    rows_data = []
-    for tr in table.find_all('tr')[1:]:
-        cells = [td.get_text(strip=True) for td in tr.find_all('td')]
-        if not cells or len(cells) != len(headers):
-            continue
-        row = dict(zip(headers, cells))
-        rows_data.append(row)
 
-    INVALID_NAME_PATTERN = re.compile(
-        r'(?i)\b(men|women|mixed|relay|team|aerial|freestyle|cross|mogul|pipe|slopestyle|snowboard|ski|event)\b'
-    )
+def looks_like_game_slug(val: str) -> bool:
+    return bool(val and re.match(r'^[a-z0-9]+(?:-[a-z0-9]+)+-\d{4}$', val))
 
-    def looks_like_game_slug(val: str) -> bool:
-        return bool(val and re.match(r'^[a-z0-9]+(?:-[a-z0-9]+)+-\d{4}$', val))
 
-    inserted = 0
-    skipped = 0
-    for rec in rows_data:
+def results_html_rows(path: Path):
+    """
+    (name, athlete, result) for every row of olympic_results.html; athlete is
+    None for rows to skip (no name, event-like name).
+    """
+    for rec in iter_html_rows(path):
         name = rec.get('athlete_full_name') or rec.get('athletes') or rec.get('participant_title')
         if not name or INVALID_NAME_PATTERN.search(name):
-            skipped += 1
+            yield name, None, None
             continue
 
         is_team = rec.get('participant_type') and 'TEAM' in rec.get('participant_type').upper()
@@ -216,22 +290,9 @@ def ingest_results_html(conn, path: Path):
                 'ref_id': None,
             }
 
-        try:
-            athlete_id = get_or_create_athlete(conn, athlete)
-        except ValueError as e:
-            print('Skipping invalid athlete:', e)
-            continue
-
-        slug = rec.get('slug_game')
-        if slug:
-            try:
-                ensure_host_exists(conn, slug)
-            except Exception as e:
-                print(f"Host missing: {slug} ({e})")
-
         result = {
-            'athlete_id': athlete_id,
-            'game_slug': slug,
+            'athlete_id': None,
+            'game_slug': rec.get('slug_game'),
             'year': None,
             'season': None,
             'city': None,
@@ -240,32 +301,106 @@ def ingest_results_html(conn, path: Path):
             'medal': rec.get('medal_type'),
             'extra': rec,
         }
+        yield name, athlete, result
 
-        result_id = insert_result(conn, result)
-        insert_medal_if_any(conn, result_id, athlete_id, slug, rec.get('medal_type'))
-        inserted += 1
 
-    print(f'Results HTML ingestion complete: inserted={inserted}, skipped={skipped}')
+def shard_of(game_slug, shards: int) -> int:
+    # crc32 et non hash() : hash() des str change d'un process à l'autre
+    return zlib.crc32(str(game_slug or '').encode('utf-8')) % shards
 
 
-# --- Ingest medals XLSX (clean & consistent) ---
-def ingest_medals(conn, path: Path):
-    print('Ingesting medals from', path)
-    try:
-        df = pd.read_excel(path)
-    except Exception as e:
-        print('Erreur de lecture Excel:', e)
+RESULT_STAGING_COLUMNS = ['name', 'team', 'noc', 'game_slug', 'sport', 'event', 'medal']
+
+
+def results_frame(rows) -> pd.DataFrame:
+    """
+    Staging frame (see bulk.py) for the (name, athlete, result) rows yielded
+    by results_html_rows, one row per result; skipped rows are left out.
+    Text is cleaned like medals_frame, `extra` is the source row as JSON.
+    """
+    records, extras = [], []
+    for _, athlete, result in rows:
+        if athlete is None:
+            continue
+        records.append((athlete['name'], athlete['team'], athlete['noc'], result['game_slug'],
+                        result['sport'], result['event'], result['medal']))
+        extras.append(result['extra'])
+    frame = pd.DataFrame(records, columns=RESULT_STAGING_COLUMNS, dtype=object)
+    for c in RESULT_STAGING_COLUMNS:
+        frame[c] = clean_text(frame[c])
+    frame['extra'] = records_json(pd.DataFrame(extras, dtype=object))
+    return frame[frame['name'].notna()]
+
+
+# --- Ingest results HTML (standardized columns) ---
+def ingest_results_html(conn, path: Path, bulk: bool = False, resolver: AthleteResolver = None,
+                        commit_every: int = 1):
+    print('Ingesting results HTML from', path)
+    if bulk:
+        frame = results_frame(results_html_rows(path))
+        stats = bulk_load_results(conn, frame)
+        print(f"results bulk ingestion: total={len(frame)}, {stats}")
         return
+    batch = ingest_result_rows(conn, results_html_rows(path), resolver=resolver, commit_every=commit_every)
+    print(f'Results HTML ingestion complete: {batch.summary()}')
+
+
+def ingest_result_rows(conn, rows, resolver: AthleteResolver = None, commit_every: int = 1) -> BatchCommitter:
+    """Upserts (name, athlete, result) rows as yielded by results_html_rows."""
+    resolver = resolver or AthleteResolver(conn)
+    batch = BatchCommitter(conn, commit_every, resolver=resolver)
+    for name, athlete, result in rows:
+        with batch.row(name):
+            if athlete is None:
+                batch.skip()
+                continue
 
+            try:
+                athlete_id = resolver.get_or_create(athlete, commit=False)
+            except ValueError as e:
+                print('Skipping invalid athlete:', e)
+                batch.skip()
+                continue
+
+            result['athlete_id'] = athlete_id
+            # insert_result crée aussi l'hôte manquant (ensure_host_exists)
+            result_id = insert_result(conn, result, commit=False)
+            insert_medal_if_any(conn, result_id, athlete_id, result['game_slug'], result['medal'], commit=False)
+    batch.commit()
+    return batch
+
+
+def medals_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorised version of the ingest_medals row mapping, one staging row
+    per medal (see bulk.py). Expects normalised column names.
+    """
+    frame = pd.DataFrame({
+        'name': first_of(df, 'athlete_full_name', 'athlete_name', 'name'),
+        'team': first_of(df, 'participant_title', 'country_name'),
+        'noc': first_of(df, 'country_code', 'noc', 'country_3_letter_code', 'country'),
+        'game_slug': first_of(df, 'slug_game', 'game_slug', 'games').fillna('unknown'),
+        'year': df['year'] if 'year' in df.columns else None,
+        'season': clean_text(df['season']) if 'season' in df.columns else None,
+        'city': clean_text(df['city']) if 'city' in df.columns else None,
+        'sport': first_of(df, 'discipline_title', 'sport'),
+        'event': first_of(df, 'event_title', 'event'),
+        'medal': first_of(df, 'medal_type', 'medal', 'medaltype'),
+        'extra': records_json(df),
+    })
+    return frame[frame['name'].notna() & frame['medal'].notna()]
+
+
+def read_medals_sheet(path: Path) -> pd.DataFrame:
+    df = read_excel_cached(path)
     # Normaliser les colonnes
     df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+    return df
 
-    total = 0
-    inserted = 0
 
+def medal_rows(df: pd.DataFrame):
+    """(athlete, result) for every usable row of the medals sheet (row mode)."""
     for _, row in df.iterrows():
-        total += 1
-
         athlete_name = row.get('athlete_full_name') or row.get('athlete_name') or row.get('name')
         noc = row.get('country_code') or row.get('noc') or row.get('country_3_letter_code') or row.get('country')
         game_slug = row.get('slug_game') or row.get('game_slug') or row.get('games')
@@ -280,15 +415,15 @@ def ingest_medals(conn, path: Path):
             for k, v in row.to_dict().items()
         }
 
-       # Vérification du nom d'athlète
+        # Vérification du nom d'athlète
         if isinstance(athlete_name, float) or pd.isna(athlete_name):
             # ignorer les lignes sans nom valide
             continue
-        
+
         athlete_name = str(athlete_name).strip()
         if not athlete_name:
             continue
-        
+
         athlete = {
             'ref_id': None,
             'name': athlete_name,
@@ -299,16 +434,9 @@ def ingest_medals(conn, path: Path):
             'team': clean_dict.get('participant_title') or clean_dict.get('country_name'),
             'noc': noc,
         }
-        
-
-        try:
-            athlete_id = get_or_create_athlete(conn, athlete)
-        except ValueError as e:
-            print('Skipping medal record due to athlete error:', e)
-            continue
 
         res = {
-            'athlete_id': athlete_id,
+            'athlete_id': None,
             'game_slug': game_slug or 'unknown',
             'year': safe_int(row.get('year')),
             'season': row.get('season'),
@@ -318,46 +446,220 @@ def ingest_medals(conn, path: Path):
             'medal': medal_type,
             'extra': clean_dict,
         }
+        yield athlete, res
 
-        result_id = insert_result(conn, res)
-        insert_medal_if_any(conn, result_id, athlete_id, res['game_slug'], medal_type)
-        inserted += 1
 
-    print(f'medals ingestion: total={total}, inserted={inserted}')
+# --- Ingest medals XLSX (clean & consistent) ---
+def ingest_medals(conn, path: Path, bulk: bool = False, resolver: AthleteResolver = None,
+                  commit_every: int = 1):
+    print('Ingesting medals from', path)
+    try:
+        df = read_medals_sheet(path)
+    except Exception as e:
+        print('Erreur de lecture Excel:', e)
+        return
 
+    if bulk:
+        frame = medals_frame(df)
+        stats = bulk_load_results(conn, frame)
+        print(f"medals bulk ingestion: total={len(frame)}, {stats}")
+        return
+
+    pending = list(medal_rows(df))
+    batch = ingest_medal_rows(conn, pending, resolver=resolver, commit_every=commit_every)
+    print(f'medals ingestion: total={len(df)}, rows={len(pending)}, {batch.summary()}')
+
+
+def ingest_medal_rows(conn, pending, resolver: AthleteResolver = None, commit_every: int = 1) -> BatchCommitter:
+    """Upserts (athlete, result) rows as yielded by medal_rows."""
+    resolver = resolver or AthleteResolver(conn)
+
+    # Athlètes résolus en mémoire / insérés par lots, puis résultats + médailles
+    batch = BatchCommitter(conn, commit_every, resolver=resolver)
+    athlete_ids = resolver.resolve_many([a for a, _ in pending], commit=False)
+    for (athlete, res), athlete_id in zip(pending, athlete_ids):
+        with batch.row(athlete.get('name')):
+            if athlete_id is None:
+                print('Skipping medal record due to athlete error:', athlete.get('name'))
+                batch.skip()
+                continue
+            res['athlete_id'] = athlete_id
+            result_id = insert_result(conn, res, commit=False)
+            insert_medal_if_any(conn, result_id, athlete_id, res['game_slug'], res['medal'], commit=False)
+    batch.commit()
+    return batch
+
+
+# --- Parallel ingestion (--workers N) ---
+def frame_athletes(frame: pd.DataFrame) -> dict:
+    """
+    Athletes of a staging frame, keyed like AthleteResolver.key, with the
+    name / team / noc that bulk_load_results inserts: first row of each
+    (lower(name), lower(team)) key, text already cleaned by medals_frame /
+    results_frame.
+    """
+    frame = frame[frame['name'].notna()]
+    keys = pd.DataFrame({
+        'name': frame['name'].str.lower(),
+        'team': frame['team'].fillna('').str.lower(),
+    }, index=frame.index)
+    first = frame.loc[~keys.duplicated(), ['name', 'team', 'noc']]
+    first = first.astype(object).where(first.notna(), None)
+    return {
+        AthleteResolver.key(name, team): {'name': name, 'team': team, 'noc': noc}
+        for name, team, noc in first.itertuples(index=False, name=None)
+    }
+
+
+def prepare_shards(conn, shards: int, results: Path = None, medals: Path = None, bulk: bool = False):
+    """
+    Phase 1 of the parallel mode, in the parent process. Each source is
+    parsed once and its rows are split by shard_of(game_slug): results and
+    medals of the same game land in the same shard, so the only rows that
+    upsert the same result key are handled by one worker, in order.
+    Every host and athlete referenced is created up front (sorted keys,
+    one transaction), so workers never race on those either.
+
+    Returns one {'results': ..., 'medals': ...} per shard: row lists, or
+    staging frames (see bulk.py) with bulk.
+    """
+    slugs = set()
+    athletes = {}
+    payloads = [{'results': [], 'medals': []} for _ in range(shards)]
+
+    def add(athlete, slug):
+        slugs.add(slug)
+        try:
+            athletes[AthleteResolver.key(*normalize_athlete(athlete))] = athlete
+        except ValueError:
+            pass
+
+    def split(frame, source):
+        slugs.update(frame['game_slug'].dropna())
+        athletes.update(frame_athletes(frame))
+        shard_ids = frame['game_slug'].map(lambda slug: shard_of(slug, shards))
+        for i, payload in enumerate(payloads):
+            payload[source] = frame[shard_ids == i]
+
+    if results is not None:
+        if bulk:
+            split(results_frame(results_html_rows(results)), 'results')
+        else:
+            for row in results_html_rows(results):
+                _, athlete, result = row
+                if athlete is not None:
+                    add(athlete, result['game_slug'])
+                    payloads[shard_of(result['game_slug'], shards)]['results'].append(row)
+    if medals is not None:
+        df = read_medals_sheet(medals)
+        if bulk:
+            split(medals_frame(df), 'medals')
+        else:
+            for athlete, res in medal_rows(df):
+                add(athlete, res['game_slug'])
+                payloads[shard_of(res['game_slug'], shards)]['medals'].append((athlete, res))
+
+    hosts = ensure_hosts_exist(conn, slugs, commit=False)
+    resolver = AthleteResolver(conn)
+    resolver.resolve_many(list(athletes.values()), commit=False)
+    conn.commit()
+    print(f'parallel ingestion, phase 1: hosts={hosts}, athletes={len(athletes)} (new: {resolver.inserted})')
+    return payloads
+
+
+def ingest_shard(shard, payload: dict, bulk: bool = False, commit_every: int = 1):
+    """
+    Worker entry point: one process, one connection, one shard. Results
+    first, then medals, as in the sequential mode (the medal row wins).
+    """
+    label = f'shard {shard[0] + 1}/{shard[1]}'
+    with connection() as conn:
+        resolver = AthleteResolver(conn)
+        if len(payload['results']):
+            if bulk:
+                print(f"{label} results bulk: {bulk_load_results(conn, payload['results'])}")
+            else:
+                batch = ingest_result_rows(conn, payload['results'], resolver=resolver, commit_every=commit_every)
+                print(f'{label} results: {batch.summary()}')
+        if len(payload['medals']):
+            if bulk:
+                print(f"{label} medals bulk: {bulk_load_results(conn, payload['medals'])}")
+            else:
+                batch = ingest_medal_rows(conn, payload['medals'], resolver=resolver, commit_every=commit_every)
+                print(f'{label} medals: {batch.summary()}')
+    return shard
+
+
+def ingest_parallel(conn, workers: int, results: Path = None, medals: Path = None,
+                    bulk: bool = False, commit_every: int = 1):
+    payloads = prepare_shards(conn, workers, results=results, medals=medals, bulk=bulk)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [
+            pool.submit(ingest_shard, (i, workers), payload, bulk, commit_every)
+            for i, payload in enumerate(payloads)
+        ]
+        for f in as_completed(futures):
+            shard = f.result()
+            print(f'shard {shard[0] + 1}/{shard[1]} done')
 
 
 # --- Main orchestration ---
 def main():
-    conn = get_conn()
-    create_tables_from_sql(conn, SQL_INIT)
-
-    hosts = DATASET / 'olympic_hosts.xml'
-    athletes = DATASET / 'olympic_athletes.json'
-    results = DATASET / 'olympic_results.html'
-    medals = DATASET / 'olympic_medals.xlsx'
-
-    # if hosts.exists():
-    #     ingest_hosts(conn, hosts)
-    # else:
-    #     print('Hosts file not found:', hosts)
-
-    # if athletes.exists():
-    #     ingest_athletes_json(conn, athletes)
-    # else:
-    #     print('Athletes file not found:', athletes)
-
-    if results.exists():
-        ingest_results_html(conn, results)
-    else:
-        print('Results HTML file not found:', results)
-
-    if medals.exists():
-        ingest_medals(conn, medals)
-    else:
-        print('Medals file not found:', medals)
-
-    conn.close()
+    parser = argparse.ArgumentParser(description='Ingest dataset/ into PostgreSQL')
+    parser.add_argument('--bulk', action='store_true',
+                        help='COPY results and medals into a staging table and resolve them with set-based SQL')
+    parser.add_argument('--commit-every', type=int, default=1, metavar='N',
+                        help='commit every N rows (each row keeps its own savepoint)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help='load results / medals in N processes, sharded by game_slug')
+    parser.add_argument('--dataset', type=Path, default=DATASET, metavar='DIR',
+                        help='source directory (e.g. a generated dataset, see ai/generate_dataset.py)')
+    args = parser.parse_args()
+
+    with connection() as conn:
+        create_tables_from_sql(conn, SQL_INIT)
+
+        hosts = args.dataset / 'olympic_hosts.xml'
+        athletes = args.dataset / 'olympic_athletes.json'
+        results = args.dataset / 'olympic_results.html'
+        medals = args.dataset / 'olympic_medals.xlsx'
+
+        # if hosts.exists():
+        #     ingest_hosts(conn, hosts)
+        # else:
+        #     print('Hosts file not found:', hosts)
+
+        # if athletes.exists():
+        #     ingest_athletes_json(conn, athletes, resolver=resolver, commit_every=args.commit_every)
+        # else:
+        #     print('Athletes file not found:', athletes)
+
+        if args.workers > 1:
+            for path, found in ((results, results.exists()), (medals, workbook_exists(medals))):
+                if not found:
+                    print('File not found:', path)
+            ingest_parallel(conn, args.workers,
+                            results=results if results.exists() else None,
+                            medals=medals if workbook_exists(medals) else None,
+                            bulk=args.bulk, commit_every=args.commit_every)
+            return
+
+        # identités athlètes chargées une seule fois pour toutes les sources
+        resolver = AthleteResolver(conn)
+
+        if results.exists():
+            ingest_results_html(conn, results, bulk=args.bulk, resolver=resolver,
+                                commit_every=args.commit_every)
+        else:
+            print('Results HTML file not found:', results)
+
+        # classeur, ou cache Arrow seul pour un jeu généré trop grand pour Excel
+        if workbook_exists(medals):
+            ingest_medals(conn, medals, bulk=args.bulk, resolver=resolver,
+                          commit_every=args.commit_every)
+        else:
+            print('Medals file not found:', medals)
 
 
 if __name__ == '__main__':
@@ -28,6 +28,11 @@ CREATE TABLE IF NOT EXISTS athletes (
     noc TEXT
 );
 
+-- Profile fields from olympic_athletes.json
+ALTER TABLE athletes ADD COLUMN IF NOT EXISTS profile_url TEXT;
+ALTER TABLE athletes ADD COLUMN IF NOT EXISTS bio TEXT;
+ALTER TABLE athletes ADD COLUMN IF NOT EXISTS games_participations INTEGER;
+
 -- Deduplicate any existing athletes that would violate the unique constraint
 -- We group by lower(name) and lower(coalesce(team,'')) and keep the row with the smallest id
 -- Then update references in `results` to point to the kept id and delete duplicates.
@@ -2,39 +2,24 @@
 Migration helper: extract useful fields from JSONB `extra` (on `results`) into proper `results` table columns.
 
 Usage:
-    python migrate_extra.py
+    python migrate_extra.py [--batch-size N] [--commit-every N]
 
 What it does:
 - Adds result-specific columns to `results` if missing (participant/team/country, sport, event, medal)
 - Copies values from `results.extra` into those columns when NULL
 - Fills athletes.age when a valid birth year is found in extra
 
+Everything runs server-side as set-based UPDATEs over ranges of result ids.
+Each range runs in its own SAVEPOINT (see db.BatchCommitter): a failing
+range is rolled back and split in halves until the failing row is isolated,
+the other ranges are kept. Commits happen every `--commit-every` ranges.
+
 Safe and idempotent.
 """
 
-import os
-import psycopg2
-import psycopg2.extras
-from dotenv import load_dotenv
-from pathlib import Path
-from datetime import datetime
-import math
-import json
-
-BASE = Path(__file__).resolve().parent.parent
-load_dotenv(BASE / '.env')
-
-DSN = dict(
-    host=os.getenv('DB_HOST'),
-    port=os.getenv('DB_PORT'),
-    dbname=os.getenv('DB_NAME'),
-    user=os.getenv('DB_USER'),
-    password=os.getenv('DB_PASSWORD'),
-)
+import argparse
 
-
-def get_conn():
-    return psycopg2.connect(**{k: v for k, v in DSN.items() if v})
+from db import connection, BatchCommitter
 
 
 def ensure_columns(conn):
@@ -58,102 +43,161 @@ def ensure_columns(conn):
     conn.commit()
 
 
-def sanitize_json(data):
-    """Remove NaN / Infinity values that break psycopg2 JSON decoding."""
-    if isinstance(data, float) and (math.isnan(data) or math.isinf(data)):
-        return None
-    if isinstance(data, dict):
-        return {k: sanitize_json(v) for k, v in data.items()}
-    if isinstance(data, list):
-        return [sanitize_json(v) for v in data]
-    return data
-
-
-def migrate_from_results_extra(conn):
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    cur.execute("""
-        SELECT id, athlete_id, extra
-        FROM results
-        WHERE extra IS NOT NULL;
-    """)
-    rows = cur.fetchall()
-    print(f"Found {len(rows)} results with extra to inspect")
-
+# columns filled from `extra`, with the keys tried in order (first non-empty wins)
+FIELDS = {
+    'discipline_title': ('discipline_title', 'discipline', 'sport'),
+    'slug_game': ('slug_game', 'game_slug', 'game'),
+    'event_title': ('event_title', 'event', 'event_name'),
+    'event_gender': ('event_gender', 'gender', 'sex'),
+    'medal_type': ('medal_type', 'medal'),
+    'participant_type': ('participant_type', 'participant'),
+    'participant_title': ('participant_title', 'team', 'participant_name'),
+    'athlete_url': ('athlete_url', 'athlete_uri'),
+    'athlete_full_name': ('athlete_full_name', 'athlete_name', 'full_name'),
+    'country_name': ('country_name', 'country', 'nation'),
+    'country_code': ('country_code', 'iso2'),
+    'country_3_letter_code': ('country_3_letter_code', 'iso3'),
+}
+
+# fallback for every field when extra.country is a nested object (as the former pick())
+COUNTRY_OBJECT_KEYS = ('name', 'country_name', 'code', 'iso3', 'alpha3')
+
+BIRTH_YEAR_KEYS = ('athlete_year_birth', 'birth_year', 'year_of_birth')
+
+
+def _scalar(path: str) -> str:
+    """SQL for a scalar JSON value as text, NULL when missing, empty, 'nan' or not a scalar."""
+    return (f"CASE WHEN jsonb_typeof({path}) IN ('string', 'number', 'boolean') "
+            f"AND lower(trim({path} #>> '{{}}')) NOT IN ('', 'nan') THEN {path} #>> '{{}}' END")
+
+
+def pick_sql(keys) -> str:
+    """
+    COALESCE over extra->key for each key, then extra->'country'->key when
+    extra.country is an object: same rules as the former Python pick().
+    """
+    exprs = [_scalar(f"extra -> '{k}'") for k in keys]
+    exprs += [_scalar(f"extra -> 'country' -> '{k}'") for k in COUNTRY_OBJECT_KEYS]
+    return 'COALESCE(' + ', '.join(exprs) + ')'
+
+
+def _empty(col: str) -> str:
+    return f"(r.{col} IS NULL OR trim(r.{col}) = '')"
+
+
+def results_update_sql() -> str:
+    """One UPDATE for an id range: only empty columns are filled, untouched rows are not rewritten."""
+    picks = ',\n               '.join(
+        f"{pick_sql(keys)} AS {col}" for col, keys in FIELDS.items()
+    )
+    sets = ',\n        '.join(
+        f"{col} = CASE WHEN {_empty(col)} THEN COALESCE(s.{col}, r.{col}) ELSE r.{col} END" for col in FIELDS
+    )
+    changed = '\n       OR '.join(f"({_empty(col)} AND s.{col} IS NOT NULL)" for col in FIELDS)
+    return f"""
+        WITH s AS (
+            SELECT id,
+               {picks}
+            FROM results
+            WHERE id BETWEEN %(lo)s AND %(hi)s
+              AND jsonb_typeof(extra) = 'object'
+        )
+        UPDATE results r SET
+        {sets}
+        FROM s
+        WHERE r.id = s.id
+          AND ({changed})
+    """
+
+
+def athletes_update_sql() -> str:
+    """Fill athletes.age from a birth year in extra (first result of the athlete wins)."""
+    return f"""
+        WITH b AS (
+            SELECT DISTINCT ON (athlete_id) athlete_id, trim(birth_year) AS birth_year
+            FROM (
+                SELECT id, athlete_id, {pick_sql(BIRTH_YEAR_KEYS)} AS birth_year
+                FROM results
+                WHERE id BETWEEN %(lo)s AND %(hi)s
+                  AND athlete_id IS NOT NULL
+                  AND jsonb_typeof(extra) = 'object'
+            ) t
+            -- CASE: no cast is attempted on a non-numeric value
+            WHERE CASE WHEN trim(birth_year) ~ '^[0-9]{{1,9}}$' THEN trim(birth_year)::int END
+                  BETWEEN 1800 AND extract(year FROM now())::int
+            ORDER BY athlete_id, id
+        )
+        UPDATE athletes a
+        SET age = extract(year FROM now())::int - b.birth_year::int
+        FROM b
+        WHERE a.id = b.athlete_id
+          AND (a.age IS NULL OR a.age = 0)
+    """
+
+
+def migrate_from_results_extra(conn, batch_size: int = 50000, commit_every: int = 1):
+    """
+    Set-based migration: the JSON extraction runs in PostgreSQL (extra -> key
+    with COALESCE fallbacks), one UPDATE on results and one on athletes per
+    range of `batch_size` ids. Nothing is fetched into Python except the id
+    bounds.
+
+    Each range is one BatchCommitter row (SAVEPOINT), committed every
+    `commit_every` ranges. A range that fails is retried in two halves,
+    down to single ids, so one bad row only costs itself. Ranges that
+    change nothing count as skipped.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT min(id), max(id), count(*) FROM results WHERE extra IS NOT NULL")
+    lo, hi, n = cur.fetchone()
+    print(f"Found {n} results with extra to inspect")
+    if not n:
+        return
+
+    results_sql = results_update_sql()
+    athletes_sql = athletes_update_sql()
     updated_results = 0
     updated_athletes = 0
-
-    for r in rows:
-        extra = sanitize_json(r['extra']) or {}
-        if not isinstance(extra, dict):
+    batch = BatchCommitter(conn, commit_every)
+
+    # stack: pop() yields the ranges in ascending id order
+    ranges = [(start, min(start + batch_size - 1, hi)) for start in range(lo, hi + 1, batch_size)][::-1]
+    while ranges:
+        r_lo, r_hi = ranges.pop()
+        label = f'ids {r_lo}-{r_hi}'
+        counts = None
+        # only single rows count as failed: a failing range is retried in halves
+        with batch.row(label, count_failure=r_lo == r_hi):
+            bounds = {'lo': r_lo, 'hi': r_hi}
+            cur.execute(results_sql, bounds)
+            n_results = cur.rowcount
+            cur.execute(athletes_sql, bounds)
+            counts = (n_results, cur.rowcount)
+            if counts == (0, 0):
+                batch.skip()
+        if batch.last_error is not None:
+            if r_lo < r_hi:
+                print(f'Range {label!r} rolled back, retrying in halves: {batch.last_error}')
+                mid = (r_lo + r_hi) // 2
+                ranges += [(mid + 1, r_hi), (r_lo, mid)]
             continue
+        updated_results += counts[0]
+        updated_athletes += counts[1]
+    batch.commit()
 
-        def pick(*keys):
-            for k in keys:
-                v = extra.get(k)
-                if v is not None and str(v).strip() != '' and str(v).lower() != 'nan':
-                    return v
-            if 'country' in extra and isinstance(extra['country'], dict):
-                for k in ('name', 'country_name', 'code', 'iso3', 'alpha3'):
-                    v = extra['country'].get(k)
-                    if v:
-                        return v
-            return None
-
-        # extract fields
-        updates = {
-            'discipline_title': pick('discipline_title', 'discipline', 'sport'),
-            'slug_game': pick('slug_game', 'game_slug', 'game'),
-            'event_title': pick('event_title', 'event', 'event_name'),
-            'event_gender': pick('event_gender', 'gender', 'sex'),
-            'medal_type': pick('medal_type', 'medal'),
-            'participant_type': pick('participant_type', 'participant'),
-            'participant_title': pick('participant_title', 'team', 'participant_name'),
-            'athlete_url': pick('athlete_url', 'athlete_uri'),
-            'athlete_full_name': pick('athlete_full_name', 'athlete_name', 'full_name'),
-            'country_name': pick('country_name', 'country', 'nation'),
-            'country_code': pick('country_code', 'iso2'),
-            'country_3_letter_code': pick('country_3_letter_code', 'iso3'),
-        }
-
-        # update results only when columns are empty
-        set_clauses = []
-        params = []
-        for k, v in updates.items():
-            if v:
-                set_clauses.append(f"{k} = CASE WHEN {k} IS NULL OR trim({k}) = '' THEN %s ELSE {k} END")
-                params.append(v)
-
-        if set_clauses:
-            params.append(r['id'])
-            sql = f"UPDATE results SET {', '.join(set_clauses)} WHERE id = %s"
-            cur.execute(sql, params)
-            updated_results += cur.rowcount
-
-        # birth year → fill athlete age (if valid)
-        birth_year = pick('athlete_year_birth', 'birth_year', 'year_of_birth')
-        if birth_year and r.get('athlete_id'):
-            try:
-                birth_year = int(str(birth_year).strip())
-            except Exception:
-                birth_year = None
-            if birth_year and 1800 <= birth_year <= datetime.now().year:
-                age = datetime.now().year - birth_year
-                cur.execute(
-                    "UPDATE athletes SET age = CASE WHEN age IS NULL OR age = 0 THEN %s ELSE age END WHERE id = %s",
-                    (age, r['athlete_id'])
-                )
-                updated_athletes += cur.rowcount
-
-    conn.commit()
-    print(f"Updated results: {updated_results}, Updated athletes: {updated_athletes}")
+    print(f"Updated results: {updated_results}, Updated athletes: {updated_athletes} "
+          f"(id ranges: {batch.summary()})")
 
 
 def main():
-    conn = get_conn()
-    ensure_columns(conn)
-    migrate_from_results_extra(conn)
-    conn.close()
+    parser = argparse.ArgumentParser(description='Copy fields of results.extra into real columns')
+    parser.add_argument('--batch-size', type=int, default=50000, help='results ids per UPDATE')
+    parser.add_argument('--commit-every', type=int, default=1, help='id ranges per commit')
+    args = parser.parse_args()
+
+    with connection() as conn:
+        ensure_columns(conn)
+        migrate_from_results_extra(conn, batch_size=args.batch_size, commit_every=args.commit_every)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# database/ scripts import each other as top-level modules (python database/ingest.py);
+# common/ provides olympics_common, so a plain checkout runs the tests without pip install -e common
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent / 'common'))
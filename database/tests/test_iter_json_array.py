@@ -0,0 +1,44 @@
+import json
+import random
+
+import pytest
+
+from ingest import iter_json_array
+
+VALUES = [
+    1.5, 123, -7, 0, 2.5e-3, 1e10, -0.25, True, False, None, "a,b]c", "",
+    {"athlete_full_name": "Jane Doe", "athlete_year_birth": 1990, "bio": None},
+    [1, [2.75, {"x": "]"}]], {}, [],
+]
+
+
+@pytest.fixture
+def array_file(tmp_path):
+    rng = random.Random(0)
+    items = [rng.choice(VALUES) for _ in range(200)]
+    path = tmp_path / "items.json"
+    # mixed separators: compact, spaces and newlines
+    path.write_text("[" + ",\n ".join(json.dumps(v, separators=(",", ":")) for v in items) + "  ]\n",
+                    encoding="utf-8")
+    return path, items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 16, 64, 1 << 20])
+def test_elements_survive_any_chunk_boundary(array_file, chunk_size):
+    path, items = array_file
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4])
+def test_numbers_split_across_chunks(tmp_path, chunk_size):
+    path = tmp_path / "numbers.json"
+    path.write_text("[1.5,123,-0.25,1e10,7]", encoding="utf-8")
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == [1.5, 123, -0.25, 1e10, 7]
+
+
+@pytest.mark.parametrize("text", ['{"a": 1}', '[1, 2', '[1.5, tru'])
+def test_invalid_input(tmp_path, text):
+    path = tmp_path / "bad.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, chunk_size=2))
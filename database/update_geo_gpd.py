@@ -17,7 +17,7 @@ Ce script :
 
 import requests
 import psycopg2
-from db import get_conn
+from db import connection
 
 
 def ensure_tables(conn):
@@ -115,11 +115,10 @@ def fetch_country_gdp(conn):
 
 
 def main():
-    conn = get_conn()
-    ensure_tables(conn)
-    fetch_country_locations(conn)
-    fetch_country_gdp(conn)
-    conn.close()
+    with connection() as conn:
+        ensure_tables(conn)
+        fetch_country_locations(conn)
+        fetch_country_gdp(conn)
     print("\n🏁 Geo + GDP data successfully updated!")
 
 